@@ -1,15 +1,26 @@
-from typing import Dict
+from typing import List, Optional
 import argparse
+import importlib
 import logging
+import sys
 from overrides import overrides
 
-from allennlp.commands.subcommand import Subcommand
-from allentune.commands.report import Report
-from allentune.commands.search import Search
-from allentune.commands.plot import Plot
-
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+# The default commands, as (module, class, help). The module of a command is only imported
+# when that command is invoked, so that e.g. ``allentune report`` or ``allentune --help`` do
+# not import allennlp, torch and ray (for search) or matplotlib and seaborn (for plot).
+SUBCOMMANDS = {
+        "search": ("allentune.commands.search", "Search", "Perform hyperparameter search"),
+        "report": ("allentune.commands.report", "Report",
+                   "Generate a report from hyperparameter search experiments."),
+        "merge": ("allentune.commands.merge", "Merge",
+                  "Merge the reports of multiple hyperparameter search experiments."),
+        "plot": ("allentune.commands.plot", "Plot", "Plot expected validation accuracy curves."),
+        "expected-max": ("allentune.commands.expected_max", "ExpectedMax",
+                         "Compute expected validation performance curves as JSON or CSV."),
+}
+
 
 class ArgumentParserWithDefaults(argparse.ArgumentParser):
     """
@@ -38,7 +49,14 @@ class ArgumentParserWithDefaults(argparse.ArgumentParser):
         super().add_argument(*args, **kwargs)
 
 
-def main(prog: str = None) -> None:
+def _invoked_command(argv: List[str]) -> Optional[str]:
+    # the top-level parser has no options besides --help, so the command comes first
+    if argv and argv[0] in SUBCOMMANDS:
+        return argv[0]
+    return None
+
+
+def main(prog: str = None, argv: Optional[List[str]] = None) -> None:
     """
     The :mod:`~allennlp.run` command only knows about the registered classes in the ``allennlp``
     codebase. In particular, once you start creating your own ``Model`` s and so forth, it won't
@@ -49,17 +67,17 @@ def main(prog: str = None) -> None:
 
     subparsers = parser.add_subparsers(title='Commands', metavar='')
 
-    subcommands = {
-            # Default commands
-            "search": Search(),
-            "report": Report(),
-            "plot": Plot()
-    }
-
-    for name, subcommand in subcommands.items():
-        subparser = subcommand.add_subparser(name, subparsers)
+    argv = sys.argv[1:] if argv is None else argv
+    command = _invoked_command(argv)
+    for name, (module, class_name, help_text) in SUBCOMMANDS.items():
+        if name == command:
+            subcommand = getattr(importlib.import_module(module), class_name)()
+            subcommand.add_subparser(name, subparsers)
+        else:
+            # only listed in the help of allentune, parsing never reaches it
+            subparsers.add_parser(name, help=help_text)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     # If a subparser is triggered, it adds its work as `args.func`.
     # So if no such attribute has been added, no subparser was triggered,
     # so give the user some help.
@@ -0,0 +1,154 @@
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+from typing import Any, Dict
+
+from allentune.commands.subcommand import Subcommand
+from allentune.util.expected_max_cache import DEFAULT_CACHE_DIR, compute_expected_max, curves_table
+
+logger = logging.getLogger(__name__)
+
+
+class ExpectedMax(Subcommand):
+    def add_subparser(self, name: str, parser: argparse._SubParsersAction) -> argparse.ArgumentParser:
+        subparser = parser.add_parser(
+                name, description="compute expected max curves from a report",
+                help='Compute expected validation performance curves as JSON or CSV.')
+        subparser.add_argument(
+            "--result-file",
+            type=str,
+            required=True,
+            help="result file written by allentune report or allentune merge"
+        )
+        subparser.add_argument(
+            "--output-file",
+            type=str,
+            required=False,
+            default=None,
+            help="file to write the curves to, standard output if not given"
+        )
+        subparser.add_argument(
+            "--output-format",
+            type=str,
+            choices=["json", "csv"],
+            required=False,
+            default=None,
+            help="format of the curves, inferred from the extension of --output-file, and json otherwise"
+        )
+        subparser.add_argument(
+            "--performance-metric-field",
+            type=str,
+            required=False,
+            default="best_validation_accuracy"
+        )
+        subparser.add_argument(
+            "--model-field",
+            type=str,
+            required=False,
+            default="model"
+        )
+        subparser.add_argument(
+            "--duration-field",
+            type=str,
+            required=False,
+            default="training_duration"
+        )
+        subparser.add_argument(
+            "--without-replacement",
+            action="store_true",
+            help="draw hyperparameter assignments from the observed trials without replacement"
+        )
+        subparser.add_argument(
+            "--bootstrap",
+            type=int,
+            required=False,
+            default=0,
+            help="number of bootstrap replicates for percentile confidence intervals of the curves"
+        )
+        subparser.add_argument(
+            "--confidence",
+            type=float,
+            required=False,
+            default=0.95,
+            help="level of the bootstrap confidence intervals"
+        )
+        subparser.add_argument(
+            "--x-axis-time",
+            action="store_true",
+            help="compute curves over wall-clock training budgets instead of hyperparameter assignments"
+        )
+        subparser.add_argument(
+            "--parallel-workers",
+            type=int,
+            required=False,
+            default=1,
+            help="number of trials run in parallel, with --x-axis-time"
+        )
+        subparser.add_argument(
+            "--workers",
+            type=int,
+            required=False,
+            default=1,
+            help="number of processes computing the curves of different models in parallel"
+        )
+        subparser.add_argument(
+            "--cache-dir",
+            type=str,
+            required=False,
+            default=DEFAULT_CACHE_DIR,
+            help="directory caching the curves of result files"
+        )
+        subparser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="always compute the curves, without reading or writing the cache"
+        )
+        subparser.set_defaults(func=expected_max_table)
+        return subparser
+
+
+def _json_curves(curves: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    curves with NaN values, e.g. budgets before any trial completes, replaced by ``None``,
+    since NaN is not valid JSON.
+    """
+    def _value(value):
+        if isinstance(value, list):
+            return [_value(item) for item in value]
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return value
+    return {model: {key: _value(value) for key, value in curve.items()} for model, curve in curves.items()}
+
+
+def expected_max_table(args: argparse.Namespace):
+    if args.x_axis_time and args.bootstrap > 0:
+        logger.warning("--bootstrap is ignored with --x-axis-time, the budget curves have no confidence intervals.")
+    curves = compute_expected_max(args.result_file,
+                                  performance_metric_field=args.performance_metric_field,
+                                  model_field=args.model_field,
+                                  duration_field=args.duration_field,
+                                  num_bootstrap=args.bootstrap,
+                                  confidence=args.confidence,
+                                  with_replacement=not args.without_replacement,
+                                  x_axis_time=args.x_axis_time,
+                                  parallel_workers=args.parallel_workers,
+                                  workers=args.workers,
+                                  cache_dir=None if args.no_cache else args.cache_dir)
+    output_format = args.output_format
+    if output_format is None:
+        extension = os.path.splitext(args.output_file or "")[1].lower()
+        output_format = "csv" if extension == ".csv" else "json"
+    if output_format == "csv":
+        output = curves_table(curves).to_csv(index=False)
+    else:
+        output = json.dumps(_json_curves(curves), indent=2, allow_nan=False) + "\n"
+    if args.output_file is None:
+        sys.stdout.write(output)
+    else:
+        with open(args.output_file, "w") as f:
+            f.write(output)
+        logger.info(f"Expected max curves of {len(curves)} models written to {args.output_file}")
@@ -1,48 +1,71 @@
 import argparse
-import glob
-import json
 import logging
 import os
-import re
-import sys
-from collections import ChainMap
-from typing import Optional
-
-import pandas as pd
 
 from allentune.commands.subcommand import Subcommand
+from allentune.util.result_files import ResultWriter, iter_results, result_format, unify_result_schemas
 
 logger = logging.getLogger(__name__)
 
 class Merge(Subcommand):
     def add_subparser(self, name: str, parser: argparse._SubParsersAction) -> argparse.ArgumentParser:
         subparser = parser.add_parser(
-                name, description="generate report from experiment", help='Generate a report from hyperparameter search experiments.')
+                name, description="merge reports from experiments", help='Merge the reports of multiple hyperparameter search experiments.')
         subparser.add_argument(
             "--input-files",
             nargs="+",
             type=str,
             required=True,
+            help="result files to merge, as .jsonl, .parquet or .arrow"
         )
         subparser.add_argument(
             '--output-file',
             type=str,
             required=True,
+            help="merged result file, its format is inferred from the extension"
+        )
+        subparser.add_argument(
+            '--dedupe',
+            action="store_true",
+            help="keep only the first result of each trial directory"
+        )
+        subparser.add_argument(
+            '--chunksize',
+            type=int,
+            default=10000,
+            help="number of rows held in memory at a time"
         )
         subparser.set_defaults(func=merge_reports)
         return subparser
 
 def merge_reports(args: argparse.Namespace):
-    dfs = []
-    for file in args.input_files:
-        dfs.append(pd.read_json(file, lines=True))
-    master = pd.concat(dfs, 0)
-    
-    try:
-        os.makedirs(os.path.dirname(args.output_file))
-    except FileExistsError:
-        logger.error(f"{args.output_file} already exists, aborting.")
+    """
+    merge result files chunk by chunk, so that memory use is bounded by ``--chunksize``
+    rather than by the total size of the inputs. A first pass collects the union of the
+    input columns; columns missing from an input are written as nulls.
+    """
+    chunksize = args.chunksize
+    schema = unify_result_schemas(args.input_files,
+                                  chunksize=chunksize,
+                                  with_types=result_format(args.output_file) != "jsonl")
+
+    output_dir = os.path.dirname(os.path.abspath(args.output_file))
+    os.makedirs(output_dir, exist_ok=True)
 
-    master.to_json(args.output_file, lines=True, orient='records')
+    seen_directories = set()
+    total, duplicates = 0, 0
+    with ResultWriter(args.output_file, schema) as writer:
+        for file in args.input_files:
+            for chunk in iter_results(file, chunksize):
+                if args.dedupe and "directory" in chunk.columns:
+                    directories = chunk['directory']
+                    duplicate = directories.notna() & (directories.isin(seen_directories) | directories.duplicated())
+                    seen_directories.update(directories.dropna())
+                    duplicates += int(duplicate.sum())
+                    chunk = chunk[~duplicate]
+                writer.write(chunk)
+                total += len(chunk)
 
-    logger.info(f"Merged files in {args.output_file}.")
\ No newline at end of file
+    if duplicates:
+        logger.info(f"Dropped {duplicates} duplicate trials.")
+    logger.info(f"Merged {total} results in {args.output_file}.")
@@ -2,22 +2,29 @@ import argparse
 import datetime
 import glob
 import json
+import logging
 import os
 from collections import ChainMap
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import scipy
 import seaborn as sns
 from matplotlib.ticker import ScalarFormatter
 
 from allentune.commands.subcommand import Subcommand
+from allentune.util.expected_max import samplemax  # noqa: F401, pylint: disable=unused-import
+from allentune.util.expected_max_cache import DEFAULT_CACHE_DIR, compute_expected_max
+from allentune.util.result_files import read_results
 
 sns.set_style("white")
 
+logger = logging.getLogger(__name__)
+
 class Plot(Subcommand):
     def add_subparser(self, name: str, parser: argparse._SubParsersAction) -> argparse.ArgumentParser:
         subparser = parser.add_parser(
@@ -25,7 +32,16 @@ class Plot(Subcommand):
         subparser.add_argument(
             "--result-file",
             type=str,
-            required=True
+            nargs="+",
+            required=True,
+            help="result files to plot, one panel per file"
+        )
+        subparser.add_argument(
+            "--dataset-field",
+            type=str,
+            required=False,
+            default=None,
+            help="field of the result files naming the dataset of each trial, to plot one panel per dataset"
         )
         subparser.add_argument(
             "--output-file",
@@ -64,6 +80,40 @@ class Plot(Subcommand):
             "--plot-errorbar",
             action="store_true"
         )
+        subparser.add_argument(
+            "--bootstrap",
+            type=int,
+            required=False,
+            default=0,
+            help="number of bootstrap replicates for percentile confidence intervals of the curves, "
+            + "plotted with --plot-errorbar instead of the standard error"
+        )
+        subparser.add_argument(
+            "--confidence",
+            type=float,
+            required=False,
+            default=0.95,
+            help="level of the bootstrap confidence intervals"
+        )
+        subparser.add_argument(
+            "--workers",
+            type=int,
+            required=False,
+            default=1,
+            help="number of processes computing the curves of different panels, or of the models of a single panel, in parallel"
+        )
+        subparser.add_argument(
+            "--cache-dir",
+            type=str,
+            required=False,
+            default=DEFAULT_CACHE_DIR,
+            help="directory caching the curves of result files"
+        )
+        subparser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="always compute the curves, without reading or writing the cache"
+        )
         subparser.add_argument(
             "--show-xticks",
             action="store_true"
@@ -78,6 +128,13 @@ class Plot(Subcommand):
             "--x-axis-time",
             action="store_true"
         )
+        subparser.add_argument(
+            "--parallel-workers",
+            type=int,
+            required=False,
+            default=1,
+            help="number of trials run in parallel, for the training duration on the x axis with --x-axis-time"
+        )
         subparser.add_argument(
             "--linewidth",
             type=int,
@@ -99,7 +156,10 @@ class Plot(Subcommand):
         subparser.add_argument(
             "--data-name",
             type=str,
-            required=True,
+            nargs="+",
+            required=False,
+            default=None,
+            help="title of each panel, the name of its result file or dataset by default"
         )
         subparser.add_argument(
             '--performance-metric',
@@ -130,66 +190,6 @@ class Plot(Subcommand):
 
 
 
-def _cdf_with_replacement(i,n,N):
-    return (i/N)**n
-
-def _cdf_without_replacement(i,n,N):
-    return scipy.special.comb(i,n) / scipy.special.comb(N,n)
-
-def _compute_variance(N, cur_data, expected_max_cond_n, pdfs):
-    """
-    this computes the standard error of the max.
-    this is what the std dev of the bootstrap estimates of the mean of the max converges to, as
-    is stated in the last sentence of the summary on page 10 of http://www.stat.cmu.edu/~larry/=stat705/Lecture13.pdf
-    uses equation 
-    """
-    variance_of_max_cond_n = []
-    for n in range(N):
-        # for a given n, estimate variance with \sum(p(x) * (x-mu)^2), where mu is \sum(p(x) * x).
-        cur_var = 0
-        for i in range(N):
-            cur_var += (cur_data[i] - expected_max_cond_n[n])**2 * pdfs[n][i]
-        cur_var = np.sqrt(cur_var)
-        variance_of_max_cond_n.append(cur_var)
-    return variance_of_max_cond_n
-    
-
-# this implementation assumes sampling with replacement for computing the empirical cdf
-def samplemax(validation_performance, with_replacement=True):
-    validation_performance = list(validation_performance)
-    validation_performance.sort()
-    N = len(validation_performance)
-    pdfs = []
-    for n in range(1,N+1):
-        # the CDF of the max
-        F_Y_of_y = []
-        for i in range(1,N+1):
-            if with_replacement:
-                F_Y_of_y.append(_cdf_with_replacement(i,n,N))
-            else:
-                F_Y_of_y.append(_cdf_without_replacement(i,n,N))
-
-        f_Y_of_y = []
-        cur_cdf_val = 0
-        for i in range(len(F_Y_of_y)):
-            f_Y_of_y.append(F_Y_of_y[i] - cur_cdf_val)
-            cur_cdf_val = F_Y_of_y[i]
-        
-        pdfs.append(f_Y_of_y)
-
-    expected_max_cond_n = []
-    for n in range(N):
-        # for a given n, estimate expected value with \sum(x * p(x)), where p(x) is prob x is max.
-        cur_expected = 0
-        for i in range(N):
-            cur_expected += validation_performance[i] * pdfs[n][i]
-        expected_max_cond_n.append(cur_expected)
-
-
-    var_of_max_cond_n = _compute_variance(N, validation_performance, expected_max_cond_n, pdfs)
-
-    return {"mean":expected_max_cond_n, "var":var_of_max_cond_n, "max": np.max(validation_performance)}
-
 def td_format(td_object):
     seconds = int(td_object.total_seconds())
     periods = [
@@ -216,9 +216,7 @@ def td_format(td_object):
     return res
 
 def _one_plot(
-            data: pd.DataFrame,
-            avg_time: pd.DataFrame,
-            data_size: int,
+            data: pd.Series,
             cur_ax: matplotlib.axis,
             data_name: str = "SST5",
             linestyle: str = "-",
@@ -261,11 +259,17 @@ def _one_plot(
     
     for ix, model in enumerate(models):
         means = data[model]['mean']
-        vars = data[model]['var']
         max_acc = data[model]['max']
+        if 'lower' in data[model]:
+            # bootstrap confidence intervals
+            lower, upper = np.array(data[model]['lower']), np.array(data[model]['upper'])
+        elif 'var' in data[model]:
+            vars = data[model]['var']
+            lower = np.array(means) - np.array(vars)
+            upper = np.minimum(np.array(means) + np.array(vars), max_acc)
         
         if x_axis_time:
-            x_axis = [avg_time[model] * (i+1) for i in range(len(means))]
+            x_axis = data[model]['budget']
         else:
             x_axis = [i+1 for i in range(len(means))]
 
@@ -279,57 +283,52 @@ def _one_plot(
                         reported_accuracy[model]],
                         linestyle='--',
                         linewidth=linewidth,
-                        color=line_colors[ix])
-            plt.text(6.912e+6-3600000,
+                        color=line_colors[ix % len(line_colors)])
+            cur_ax.text(6.912e+6-3600000,
                     reported_accuracy[model] + 0.01,
                     f'reported {model_name} {performance_metric}',
                     ha='right',
                     style='italic',
                     fontsize=fontsize-5,
-                    color=line_colors[ix])
+                    color=line_colors[ix % len(line_colors)])
 
         if encoder_name:
             model_name = encoder_name + " " + model_name
 
-        if plot_errorbar:
+        if plot_errorbar and not x_axis_time:
             if errorbar_kind == 'shade':
-                minus_vars = np.array(means)-np.array(vars)
-                plus_vars = [x + y if (x + y) <= max_acc else max_acc for x,y in zip(means, vars)]
-                plt.fill_between(x_axis,
-                                    minus_vars,
-                                    plus_vars,
+                cur_ax.fill_between(x_axis,
+                                    lower,
+                                    upper,
                                     alpha=errorbar_alpha,
-                                    facecolor=errorbar_colors[ix])
+                                    facecolor=errorbar_colors[ix % len(errorbar_colors)])
             else:
                 line = cur_ax.errorbar(x_axis,
                                 means,
-                                yerr=vars,
+                                yerr=[np.array(means) - lower, upper - np.array(means)],
                                 label=model_name,
                                 linestyle=linestyle,
                                 linewidth=linewidth,
-                                color=line_colors[ix])
+                                color=line_colors[ix % len(line_colors)])
         line = cur_ax.plot(x_axis,
                             means,
                             label=model_name,
                             linestyle=linestyle,
                             linewidth=linewidth,
-                            color=line_colors[ix])
+                            color=line_colors[ix % len(line_colors)])
     
     left, right = cur_ax.get_xlim()
     if xlim:
         cur_ax.set_xlim(xlim)
         # cur_ax.xaxis.set_ticks(np.arange(xlim[0], xlim[1]+5, 10))
 
-    for tick in cur_ax.xaxis.get_major_ticks():
-        tick.label.set_fontsize(fontsize) 
-    for tick in cur_ax.yaxis.get_major_ticks():
-        tick.label.set_fontsize(fontsize) 
-    plt.locator_params(axis='y', nbins=10)
+    cur_ax.tick_params(axis='both', labelsize=fontsize)
+    cur_ax.locator_params(axis='y', nbins=10)
     if relabel_logx_scalar:
         for axis in [cur_ax.xaxis]:
             axis.set_ticks(relabel_logx_scalar)
             axis.set_major_formatter(ScalarFormatter())
-    plt.xticks(rotation=x_axis_rot)
+    cur_ax.tick_params(axis='x', labelrotation=x_axis_rot)
     
     if show_xticks:
         cur_ax.tick_params(which="both", bottom=True)
@@ -341,8 +340,34 @@ def _one_plot(
         formatter = matplotlib.ticker.FuncFormatter(timeTicks)                                                                                                                                                                                                                         
         cur_ax.xaxis.set_major_formatter(formatter)
     cur_ax.legend(loc=legend_location, fontsize=fontsize)
-    
-    plt.tight_layout()
+
+def _panels(result_files: List[str],
+            data_names: Optional[List[str]],
+            dataset_field: Optional[str]) -> List[Tuple[str, str, Any]]:
+    """
+    the panels of the plot, as (title, result file, dataset) tuples: one per result file,
+    or, with a ``dataset_field``, one per dataset of each result file, in order of first
+    appearance.
+    """
+    panels = []
+    for result_file in result_files:
+        if dataset_field is None:
+            name = os.path.splitext(os.path.basename(result_file))[0]
+            panels.append((name, result_file, None))
+        else:
+            datasets = read_results(result_file, columns=[dataset_field])[dataset_field]
+            panels.extend((str(dataset), result_file, dataset) for dataset in pd.unique(datasets))
+    if data_names:
+        if len(data_names) != len(panels):
+            raise ValueError(f"Got {len(data_names)} data names for {len(panels)} panels.")
+        panels = [(data_name, result_file, dataset)
+                  for data_name, (_, result_file, dataset) in zip(data_names, panels)]
+    return panels
+
+
+def _curves_series(curves: Dict[str, Dict]) -> pd.Series:
+    return pd.Series({(model, key): value for model, curve in curves.items() for key, value in curve.items()})
+
 
 def plotter(args: argparse.Namespace):
 
@@ -350,38 +375,44 @@ def plotter(args: argparse.Namespace):
     subplots = tuple(config.pop("subplots"))
     figsize = tuple(config.pop("figsize"))
     _ = config.pop('func')
-    expected_max_performance_data = {}
-    average_times = {}
     output_file = config.pop("output_file")
-    config = {config.pop("result_file"): config}    
-    f, axes = plt.subplots(subplots[0], subplots[1], figsize=figsize)
-    if subplots != (1, 1):
-        axes_iter = zip(config.items(), np.ndenumerate(axes))
+    result_files = config.pop("result_file")
+    data_names = config.pop("data_name")
+    dataset_field = config.pop("dataset_field")
+    workers = config.pop("workers")
+    if config["x_axis_time"] and (config["plot_errorbar"] or config["bootstrap"] > 0):
+        # budget curves are Monte Carlo estimates, without a standard error or bootstrap
+        logger.warning("--plot-errorbar and --bootstrap are ignored with --x-axis-time, "
+                       "the budget curves are plotted without error bars.")
+    panels = _panels(result_files, data_names, dataset_field)
+    if len(panels) > subplots[0] * subplots[1]:
+        raise ValueError(f"{len(panels)} panels do not fit in {subplots[0]}x{subplots[1]} subplots.")
+
+    compute = partial(compute_expected_max,
+                      performance_metric_field=config.pop('performance_metric_field'),
+                      model_field=config.pop('model_field'),
+                      duration_field=config.pop('duration_field'),
+                      num_bootstrap=config.pop("bootstrap"),
+                      confidence=config.pop("confidence"),
+                      x_axis_time=config["x_axis_time"],
+                      parallel_workers=config.pop("parallel_workers"),
+                      dataset_field=dataset_field,
+                      cache_dir=None if config.pop("no_cache") else config.pop("cache_dir"))
+    config.pop("cache_dir", None)
+    # panels are computed in parallel, or the models of a single panel
+    if workers > 1 and len(panels) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(compute, result_file, dataset=dataset) for _, result_file, dataset in panels]
+            panel_curves = [future.result() for future in futures]
     else:
-        axes_iter = zip(config.items(), enumerate([axes]))
-    
-    for ((data_file, _), (index, _)) in axes_iter:
-        duration_field = config[data_file].pop('duration_field')
-        model_field = config[data_file].pop('model_field')
-        performance_metric_field = config[data_file].pop('performance_metric_field')
-        master = pd.read_json(data_file, lines=True)
-        data_sizes = [10000]
-        for data_size in data_sizes:
-            df = master
-            avg_time = df.groupby(model_field)[duration_field].mean()
-            sample_maxes = df.groupby(model_field)[performance_metric_field].apply(samplemax)
-            expected_max_performance_data[data_file] = {data_size: sample_maxes}
-            average_times[data_file] = {data_size: avg_time}
-            if subplots == (1,1):
-                axis = axes
-            elif subplots[1] > 1:
-                axis = axes[index[0], index[1]]
-            else:
-                axis = axes[index[0]]
-            _one_plot(sample_maxes,
-                        avg_time,
-                        data_size,
-                        axis,
-                        **config[data_file])
+        panel_curves = [compute(result_file, dataset=dataset, workers=workers) for _, result_file, dataset in panels]
+
+    f, axes = plt.subplots(subplots[0], subplots[1], figsize=figsize, squeeze=False)
+    axes = axes.ravel()
+    for (data_name, _, _), curves, axis in zip(panels, panel_curves, axes):
+        _one_plot(_curves_series(curves), axis, data_name=data_name, **config)
+    for axis in axes[len(panels):]:
+        axis.set_visible(False)
+    plt.tight_layout()
     print("saving to {}".format(output_file))
     plt.savefig(output_file, dpi=300)
@@ -5,15 +5,25 @@ import logging
 import os
 import re
 import sys
+import time
 from collections import ChainMap
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
 
 import pandas as pd
 from tabulate import tabulate
 
 from allentune.commands.subcommand import Subcommand
+from allentune.util.result_files import (RESULT_EXTENSIONS, append_results, columnar_formats_available,
+                                         read_results, write_results)
 
 logger = logging.getLogger(__name__)
+
+# Signatures of the trials already in results.jsonl, so that reports only read new trials.
+MANIFEST_FILE = ".report_manifest.json"
+
+SEED_PATTERNS = {name: re.compile(name + r" = (\d+)") for name in ("random_seed", "pytorch_seed", "numpy_seed")}
+
 class Report(Subcommand):
     def add_subparser(self, name: str, parser: argparse._SubParsersAction) -> argparse.ArgumentParser:
         subparser = parser.add_parser(
@@ -32,48 +42,178 @@ class Report(Subcommand):
             required=False,
             type=str
         )
+        subparser.add_argument(
+            '--rebuild',
+            action="store_true",
+            help="re-read every trial instead of only those added or modified since the last report"
+        )
+        subparser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="number of workers reading trial directories in parallel"
+        )
+        subparser.add_argument(
+            '--use-processes',
+            action="store_true",
+            help="read trials in a process pool instead of a thread pool"
+        )
+        subparser.add_argument(
+            '--output-format',
+            choices=sorted(RESULT_EXTENSIONS),
+            default="jsonl",
+            help="format of the results file written to the log dir; parquet and arrow require pyarrow"
+        )
         subparser.set_defaults(func=generate_report)
 
         return subparser
 
+def _trial_signature(trial_dir: str) -> Optional[List[int]]:
+    """
+    mtime and size of the files a trial's report row is built from,
+    or ``None`` if the trial has not finished yet.
+    """
+    signature = []
+    for name in ("metrics.json", "config.json"):
+        try:
+            stat = os.stat(os.path.join(trial_dir, name))
+        except FileNotFoundError:
+            return None
+        signature.extend([stat.st_mtime_ns, stat.st_size])
+    return signature
+
+def _read_seeds(trial_dir: str, config: Dict) -> Dict[str, Optional[str]]:
+    """
+    random seeds used by a trial. Each seed is taken from the trial's config when it sets
+    it. ``stdout.log`` is only scanned, line by line, for the seeds the config does not set,
+    until all of them have been logged. Seeds found in neither are ``None``.
+    """
+    seeds = {name: str(config[name]) if name in config else None for name in SEED_PATTERNS}
+    if all(seed is not None for seed in seeds.values()):
+        return seeds
+    log_file = os.path.join(trial_dir, "stdout.log")
+    if not os.path.isfile(log_file):
+        return seeds
+    with open(log_file, 'r') as stdout_file:
+        for line in stdout_file:
+            for name, pattern in SEED_PATTERNS.items():
+                if seeds[name] is None:
+                    match = pattern.search(line)
+                    if match:
+                        seeds[name] = match.group(1)
+            if all(seed is not None for seed in seeds.values()):
+                break
+    return seeds
+
+def _read_trial(trial_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(trial_dir, "metrics.json"), 'r') as metrics_file:
+            metric = json.load(metrics_file)
+        with open(os.path.join(trial_dir, "config.json"), 'r') as config_file:
+            config = json.load(config_file)
+        seeds = _read_seeds(trial_dir, config)
+        directory = {"directory": trial_dir}
+        return dict(ChainMap(metric, config, seeds, directory))
+    except:
+        return None
+
+def _read_trials(trial_dirs: List[str], workers: int = 1, use_processes: bool = False) -> Iterable[Optional[Dict]]:
+    """
+    read trial directories, in order. Reading is mostly waiting on the filesystem, so a
+    thread pool is usually enough; a process pool also parallelizes the JSON parsing.
+    """
+    if workers <= 1:
+        return list(map(_read_trial, trial_dirs))
+    if use_processes:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_read_trial, trial_dirs, chunksize=max(1, len(trial_dirs) // (4 * workers))))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_read_trial, trial_dirs))
+
+def _load_manifest(experiment_dir: str, output_file: str, model: Optional[str]) -> Dict[str, List[int]]:
+    """
+    signatures of the trials already written to ``output_file`` by a previous report. The
+    manifest is ignored if it was written for another results file, if that file is gone,
+    or if it was labeled with another model.
+    """
+    manifest_file = os.path.join(experiment_dir, MANIFEST_FILE)
+    if not os.path.exists(output_file):
+        return {}
+    try:
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("output_file") != output_file or manifest.get("model") != model:
+        return {}
+    return manifest["trials"]
+
+def _save_manifest(experiment_dir: str, output_file: str, model: Optional[str], trials: Dict[str, List[int]]) -> None:
+    manifest_file = os.path.join(experiment_dir, MANIFEST_FILE)
+    with open(manifest_file + ".tmp", 'w') as f:
+        json.dump({"output_file": output_file, "model": model, "trials": trials}, f)
+    os.replace(manifest_file + ".tmp", manifest_file)
+
 def generate_report(args: argparse.Namespace):
     experiment_dir = os.path.abspath(args.log_dir)
-    dirs = glob.glob(experiment_dir + '/run_*/trial/')
+    output_format = args.output_format
+    if output_format != "jsonl" and not columnar_formats_available():
+        logger.warning(f"pyarrow is not installed, writing results as jsonl instead of {output_format}")
+        output_format = "jsonl"
+    output_file = os.path.join(experiment_dir, "results" + RESULT_EXTENSIONS[output_format])
+    dirs = sorted(glob.glob(experiment_dir + '/run_*/trial/'))
+    signatures = {dir: _trial_signature(dir) for dir in dirs}
 
+    if args.rebuild:
+        reported = {}
+    else:
+        reported = _load_manifest(experiment_dir, output_file, args.model)
+    # trials that were modified or removed since the last report
+    stale = {dir for dir, signature in reported.items() if signatures.get(dir) != signature}
+    pending = [dir for dir, signature in signatures.items()
+               if signature is not None and (dir not in reported or dir in stale)]
+
+    workers = args.workers
+    start_time = time.time()
     master = []
-    for dir in dirs:
+    for dir, record in zip(pending, _read_trials(pending, workers, args.use_processes)):
+        if record is not None:
+            master.append(record)
+            reported[dir] = signatures[dir]
+    elapsed = time.time() - start_time
+    for dir in stale:
+        if reported.get(dir) != signatures.get(dir):
+            del reported[dir]
+    logger.info(f"Read {len(master)} new or modified trials from {args.log_dir} in {elapsed:.2f}s "
+                f"({len(pending) / max(elapsed, 1e-9):.1f} trials/sec with {workers} workers)")
+
+    new_df = pd.json_normalize(master)
+    if master:
         try:
-            with open(os.path.join(dir, "metrics.json"), 'r') as metrics_file:
-                metric = json.load(metrics_file)
-            with open(os.path.join(dir, "config.json"), 'r') as config_file:
-                config = json.load(config_file)
-            with open(os.path.join(dir, "stdout.log"), 'r') as stdout_file:
-                stdout = stdout_file.read()
-                random_seed = re.search("random_seed = (\d+)", stdout) 
-                pytorch_seed = re.search("pytorch_seed = (\d+)", stdout)
-                numpy_seed = re.search("numpy_seed = (\d+)", stdout)
-            if random_seed:
-                seeds = {"random_seed": random_seed.group(1), "pytorch_seed": pytorch_seed.group(1), "numpy_seed": numpy_seed.group(1)}
-            else:
-                seeds = {"random_seed": None, "pytorch_seed": None, "numpy_seed": None}
-            directory = {"directory": dir}
-            master.append((metric, config, seeds, directory))
-        except:
-            continue
-
-
-    master_dicts = [dict(ChainMap(*item)) for item in master]
-
-    df = pd.json_normalize(master_dicts)
-    try:
-        df['training_duration'] = pd.to_timedelta(df['training_duration']).dt.total_seconds()
-    except KeyError:
-        logger.error(f"No finished experiments found in {args.log_dir}")
-        sys.exit(0)
-    if args.model:
-        df['model'] = args.model
-    output_file = os.path.join(experiment_dir, "results.jsonl")
-    df.to_json(output_file, lines=True, orient='records')
+            new_df['training_duration'] = pd.to_timedelta(new_df['training_duration']).dt.total_seconds()
+        except KeyError:
+            logger.error(f"No finished experiments found in {args.log_dir}")
+            sys.exit(0)
+        if args.model:
+            new_df['model'] = args.model
+
+    carried_over = len(reported) - len(master)
+    if carried_over and not stale:
+        if master:
+            append_results(new_df, output_file)
+        df = read_results(output_file)
+    else:
+        if carried_over:
+            df = read_results(output_file)
+            df = df[~df['directory'].isin(stale)]
+            df = pd.concat([df, new_df], axis=0, ignore_index=True)
+        else:
+            df = new_df
+        if df.empty:
+            logger.error(f"No finished experiments found in {args.log_dir}")
+            sys.exit(0)
+        write_results(df, output_file)
+    _save_manifest(experiment_dir, output_file, args.model, reported)
     logger.info("results written to {}".format(output_file))
     try:
         best_performance = df[args.performance_metric].max()
@@ -4,8 +4,6 @@ import logging
 import os
 import argparse
 
-from allentune.modules import AllenNlpRunner
-from allentune.modules import RayExecutor
 from allentune.commands.subcommand import Subcommand
 
 if os.environ.get("ALLENTUNE_DEBUG"):
@@ -29,6 +27,21 @@ class Search(Subcommand):
             required=True,
             help="a name for the experiment",
         )
+        subparser.add_argument(
+            "--address",
+            type=str,
+            default=None,
+            help="address of an existing Ray cluster to run the trials on, e.g. auto or <head node ip>:6379. "
+            + "The resources of the cluster are used instead of --num-cpus and --num-gpus",
+        )
+        subparser.add_argument(
+            "--sync-command",
+            type=str,
+            default=None,
+            help="command template syncing trial outputs from other nodes to --log-dir on the driver, "
+            + "with {source} and {target} placeholders, e.g. 'rsync -savz {source} {target}'. "
+            + "Defaults to rsync with the cluster's SSH configuration",
+        )
         subparser.add_argument(
             "--num-cpus",
             type=int,
@@ -47,11 +60,20 @@ class Search(Subcommand):
             default=1,
             help="number of CPUs dedicated to a single trial",
         )
-        subparser.add_argument(
+        # a number of trials per GPU fixes the fraction of a GPU each trial gets
+        gpu_packing = subparser.add_mutually_exclusive_group()
+        gpu_packing.add_argument(
             "--gpus-per-trial",
-            type=int,
+            type=float,
             default=1,
-            help="number of GPUs dedicated to a single trial",
+            help="number of GPUs dedicated to a single trial. A fraction of a GPU runs several trials "
+            + "on the same GPU, e.g. 0.5 packs two trials per GPU",
+        )
+        gpu_packing.add_argument(
+            "--trials-per-gpu",
+            type=int,
+            default=None,
+            help="number of trials packed on each GPU, an alternative to a fractional --gpus-per-trial",
         )
         subparser.add_argument(
             "--log-dir",
@@ -74,8 +96,100 @@ class Search(Subcommand):
         subparser.add_argument(
             "--search-strategy",
             type=str,
+            choices=["variant-generation", "sobol", "latin-hypercube", "hyperopt", "skopt"],
             default="variant-generation",
-            help="hyperparameter search strategy used by Ray-Tune",
+            help="hyperparameter search strategy used by Ray-Tune: random sampling (variant-generation), "
+            + "a scrambled Sobol or Latin hypercube design of --num-samples configurations (sobol, latin-hypercube), "
+            + "tree-structured Parzen estimators (hyperopt) or Gaussian process Bayesian optimization (skopt)",
+        )
+        subparser.add_argument(
+            "--max-concurrent",
+            type=int,
+            default=0,
+            help="maximum number of trials run concurrently by the hyperopt and skopt search strategies, "
+            + "0 for no limit",
+        )
+        subparser.add_argument(
+            "--random-seed",
+            type=int,
+            default=None,
+            help="seed for sampling hyperparameters. Every trial samples from its own random stream "
+            + "spawned from the seed, so the sweep can be replayed exactly, and trials that already "
+            + "completed in the experiment directory are skipped",
+        )
+        subparser.add_argument(
+            "--deduplicate",
+            type=str,
+            choices=["resample", "reuse"],
+            default=None,
+            help="avoid training a configuration that was already evaluated in the experiment: "
+            + "resample the hyperparameters of the trial, or reuse the metrics of the earlier trial",
+        )
+        subparser.add_argument(
+            "--resume",
+            action="store_true",
+            default=False,
+            help="resume an interrupted search: trials of the experiment that already completed in "
+            + "--log-dir count against --num-samples, and only the remaining trials are run",
+        )
+        subparser.add_argument(
+            "--cache-dataset",
+            action="store_true",
+            default=False,
+            help="share the instances read by the dataset readers and the vocabulary across the trials "
+            + "of the experiment, so that only the first trial reads the data and builds the vocabulary",
+        )
+        subparser.add_argument(
+            "--max-failures",
+            type=int,
+            default=0,
+            help="number of times a failed trial is retried. A retried trial resumes training from "
+            + "the latest checkpoint of its earlier attempt, -1 to retry indefinitely",
+        )
+        subparser.add_argument(
+            "--scheduler",
+            type=str,
+            choices=["fifo", "asha", "hyperband", "median"],
+            default="fifo",
+            help="trial scheduler used by Ray-Tune to stop poorly performing trials early, "
+            + "based on the metrics reported after every epoch",
+        )
+        subparser.add_argument(
+            "--metric",
+            type=str,
+            default="validation_loss",
+            help="metric that schedulers and search strategies compare trials on",
+        )
+        subparser.add_argument(
+            "--mode",
+            type=str,
+            choices=["min", "max"],
+            default="min",
+            help="whether the metric should be minimized or maximized",
+        )
+        subparser.add_argument(
+            "--max-t",
+            type=int,
+            default=100,
+            help="maximum number of epochs a trial may train for under the asha and hyperband schedulers",
+        )
+        subparser.add_argument(
+            "--grace-period",
+            type=int,
+            default=1,
+            help="number of epochs a trial trains for before the scheduler may stop it",
+        )
+        subparser.add_argument(
+            "--reduction-factor",
+            type=int,
+            default=4,
+            help="fraction of trials (1 / reduction factor) promoted at each rung of the asha and hyperband schedulers",
+        )
+        subparser.add_argument(
+            "--brackets",
+            type=int,
+            default=3,
+            help="number of brackets of the hyperband scheduler",
         )
         subparser.add_argument(
             "--search-space",
@@ -121,6 +235,8 @@ class Search(Subcommand):
 
 
 def search_from_args(args: argparse.Namespace):
+    # allennlp, torch and ray are only imported when a search runs
+    from allentune.modules import AllenNlpRunner, RayExecutor
     runner = AllenNlpRunner()
     executor = RayExecutor(runner)
     executor.run(args)
@@ -3,9 +3,10 @@ import glob
 import json
 import logging
 import os
+import shutil
 from collections import ChainMap
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 import torch
@@ -14,13 +15,116 @@ from allennlp.common.params import Params, parse_overrides, with_fallback
 from allennlp.common.util import import_module_and_submodules
 
 import _jsonnet
+from allentune.modules.tune_callbacks import TuneReportCallback  # pylint: disable=unused-import
+from allentune.util.config_index import CONFIG_INDEX_DIR, ConfigIndex, config_hash
+from allentune.util.dataset_cache import DATASET_CACHE_DIR, save_vocabulary, use_dataset_cache
 from allentune.util.random_search import HyperparameterSearch
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+# Config key holding a complete configuration, for trials whose hyperparameters
+# were fixed up front by the driver rather than sampled in the trial.
+DESIGN_POINT = "design_point"
+
+# Design point key holding the training config rendered by the driver.
+RENDERED_CONFIG = "rendered_config"
+
+# Number of times a trial resamples a configuration that was already evaluated.
+MAX_RESAMPLES = 100
+
+
+class ConfigRenderer(object):
+    """
+    renders a Jsonnet training config with hyperparameters as external variables. The
+    rendered JSON is memoized by the external variables, so configurations that are
+    rendered again, such as duplicate samples, are not re-evaluated.
+    """
+
+    def __init__(self, snippet: str) -> None:
+        self._snippet = snippet
+        self._cache: Dict[Tuple[Tuple[str, str], ...], str] = {}
+
+    def render_json(self, hyperparameters: Dict[str, Any]) -> str:
+        ext_vars = {key: str(val) for key, val in hyperparameters.items()}
+        key = tuple(sorted(ext_vars.items()))
+        if key not in self._cache:
+            self._cache[key] = _jsonnet.evaluate_snippet("config", self._snippet, tla_codes={}, ext_vars=ext_vars)
+        return self._cache[key]
+
+    def render(self, hyperparameters: Dict[str, Any]) -> Dict[str, Any]:
+        return json.loads(self.render_json(hyperparameters))
+
+
 class AllenNlpRunner(object):
     name = "AllenNLP"
 
+    def render_design(self, args: argparse.Namespace, design: List[Dict]) -> List[Dict]:
+        """
+        render the training config of every configuration of a design on the driver, so
+        that invalid configurations fail the search before any trial is dispatched, and
+        trials receive their rendered config instead of evaluating the Jsonnet themselves.
+        """
+        with open(args.base_config, "r") as parameter_f:
+            renderer = ConfigRenderer(parameter_f.read())
+        rendered_design = []
+        for design_point in design:
+            hyperparameters = HyperparameterSearch(**design_point).sample()
+            try:
+                rendered_config = renderer.render_json(hyperparameters)
+            except RuntimeError as e:
+                raise ValueError(f"Invalid configuration {hyperparameters}: {e}")
+            if "trainer" not in json.loads(rendered_config):
+                raise ValueError(f"Configuration {hyperparameters} has no trainer.")
+            rendered_design.append(dict(design_point, **{RENDERED_CONFIG: rendered_config}))
+        return rendered_design
+
+    def sample_params(self, args: argparse.Namespace, config: Dict[str, Any], renderer: ConfigRenderer) -> Dict[str, Any]:
+        """
+        sample the hyperparameters of a trial and render its training config. With
+        ``args.deduplicate``, a configuration that was already evaluated in the experiment
+        is resampled, or the metrics of the earlier trial are copied to the trial directory.
+        """
+        config.update(config.pop(DESIGN_POINT, {}))
+        rendered_config = config.pop(RENDERED_CONFIG, None)
+        search_space = HyperparameterSearch(**config)
+        deduplicate = args.deduplicate
+        if deduplicate:
+            index = ConfigIndex(os.path.join(args.cwd, args.log_dir, args.experiment_name, CONFIG_INDEX_DIR))
+            # configurations fixed by the driver cannot be resampled
+            max_resamples = MAX_RESAMPLES if any(callable(val) for val in config.values()) else 0
+        for attempt in range(MAX_RESAMPLES + 1):
+            sample = search_space.sample()
+            for k, v in sample.items():
+                config[k] = str(v)
+
+            if rendered_config is not None:
+                params_dict = json.loads(rendered_config)
+            else:
+                params_dict = renderer.render(config)
+            if not deduplicate:
+                break
+            earlier_trial = index.claim(config_hash(params_dict), os.getcwd())
+            # a retried trial may have claimed its configuration in an earlier attempt
+            if earlier_trial is None or earlier_trial == os.getcwd():
+                break
+            earlier_metrics = os.path.join(earlier_trial, "trial", "metrics.json")
+            if deduplicate == "reuse" and os.path.isfile(earlier_metrics):
+                logger.info(f"Configuration was already evaluated in {earlier_trial}, reusing its metrics.")
+                os.makedirs("trial", exist_ok=True)
+                shutil.copy(os.path.join(earlier_trial, "trial", "config.json"), "trial")
+                shutil.copy(earlier_metrics, "trial")
+                # the report reads the seeds of the trial from its log
+                earlier_log = os.path.join(earlier_trial, "trial", "stdout.log")
+                if os.path.isfile(earlier_log):
+                    shutil.copy(earlier_log, "trial")
+                break
+            if deduplicate == "resample" and attempt < max_resamples:
+                continue
+            logger.warning(f"Configuration was already claimed by {earlier_trial or 'another trial'}, "
+                           "training it again.")
+            break
+        return params_dict
+
     def get_run_func(
         self,
         args: argparse.Namespace,
@@ -29,27 +133,39 @@ class AllenNlpRunner(object):
             raise ValueError("No run arguments found for AllenNLP runner.")
 
         with open(args.base_config, "r") as parameter_f:
-            parameter_file_snippet = parameter_f.read()
+            renderer = ConfigRenderer(parameter_f.read())
 
         def train_func(config, reporter):
             logger.debug(f"CUDA_VISIBLE_DEVICES: {os.environ['CUDA_VISIBLE_DEVICES']}")
             
-            for package_name in getattr(args, "include_package", ()):
+            for package_name in args.include_package:
                 import_module_and_submodules(package_name)
 
-            search_space = HyperparameterSearch(**config)
-            sample = search_space.sample()
-            for k, v in sample.items():
-                config[k] = str(v)
-            
-            params_dict = json.loads(
-                _jsonnet.evaluate_snippet(
-                    "config", parameter_file_snippet, tla_codes={}, ext_vars=config
-                )
-            )
-            if args.num_gpus == 0:
-                logger.warning(f"No GPU specified, using CPU.")
-                params_dict["trainer"]["cuda_device"] = -1
+            vocabulary_dir = None
+            recover = os.path.isfile(os.path.join("trial", "config.json"))
+            if recover:
+                # a retry of a failed trial runs in the same directory, and resumes the
+                # configuration of the earlier attempt from its latest checkpoint
+                logger.info(f"Recovering trial from {os.path.abspath('trial')}.")
+                with open(os.path.join("trial", "config.json"), "r") as config_file:
+                    params_dict = json.load(config_file)
+            else:
+                # an earlier attempt failed before it saved its configuration
+                shutil.rmtree("trial", ignore_errors=True)
+                params_dict = self.sample_params(args, config, renderer)
+
+                if args.num_gpus == 0 or args.gpus_per_trial == 0 or not torch.cuda.is_available():
+                    logger.warning(f"No GPU available to the trial, using CPU.")
+                    params_dict["trainer"]["cuda_device"] = -1
+
+                # report every epoch to Tune, so that schedulers can stop poor trials early
+                epoch_callbacks = params_dict["trainer"].setdefault("epoch_callbacks", [])
+                epoch_callbacks.append({"type": "tune_report"})
+
+                # instances and vocabulary are shared by the trials of the experiment
+                if args.cache_dataset:
+                    cache_dir = os.path.join(args.cwd, args.log_dir, args.experiment_name, DATASET_CACHE_DIR)
+                    vocabulary_dir = use_dataset_cache(params_dict, cache_dir)
 
             if args.cpus_per_trial > 0:
                 torch.set_num_threads(args.cpus_per_trial)
@@ -58,8 +174,15 @@ class AllenNlpRunner(object):
 
             logger.debug(f"AllenNLP Configuration: {params.as_dict()}")
 
-            train_model(params=params, serialization_dir="trial")
+            # the metrics of a duplicate configuration may have been reused instead
+            if not os.path.isfile(os.path.join("trial", "metrics.json")):
+                train_model(params=params, serialization_dir="trial", recover=recover)
+                if vocabulary_dir is not None:
+                    save_vocabulary("trial", vocabulary_dir)
 
-            reporter(done=True)
+            # the final metrics are what search algorithms learn from
+            with open(os.path.join("trial", "metrics.json"), "r") as metrics_file:
+                metrics = json.load(metrics_file)
+            reporter(done=True, **{key: value for key, value in metrics.items() if isinstance(value, (int, float))})
             
         return train_func
@@ -1,21 +1,46 @@
 import argparse
+import glob
 import json
 import logging
 import os
 import random
-from typing import Any, Callable, Dict, Optional
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
 
 import numpy as np
 import ray
-from ray.tune import function, register_trainable, run_experiments, sample_from
+from ray.tune import function, grid_search, register_trainable, run_experiments, sample_from
 from ray.tune.function_runner import StatusReporter
+from ray.tune.result import EXPR_PARAM_FILE
+from ray.tune.schedulers import AsyncHyperBandScheduler, MedianStoppingRule, TrialScheduler
+from ray.tune.suggest import ConcurrencyLimiter, Searcher
 
-from allentune.modules.allennlp_runner import AllenNlpRunner
-from allentune.util.random_search import RandomSearch
+from allentune.modules.allennlp_runner import DESIGN_POINT, MAX_RESAMPLES, RENDERED_CONFIG, AllenNlpRunner
+from allentune.util.random_search import HyperparameterSearch, RandomSearch
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
+# Search strategies that fix every configuration up front, from a space-filling design.
+DESIGNS = {"sobol": RandomSearch.sobol_design, "latin-hypercube": RandomSearch.latin_hypercube_design}
+
+
+def _map_search_space(search_config: Dict, constructors: Dict[str, Callable[[str, Dict], Any]]) -> Dict:
+    """
+    map every sampled hyperparameter of a search space through the constructor of its
+    sampling strategy, called with the name and the spec of the hyperparameter. Constant
+    hyperparameters are left out.
+    """
+    space = {}
+    for hyperparameter, val in search_config.items():
+        if not isinstance(val, dict):
+            continue
+        if val['sampling strategy'] not in constructors:
+            raise KeyError(f"sampling strategy {val['sampling strategy']} does not exist")
+        space[hyperparameter] = constructors[val['sampling strategy']](hyperparameter, val)
+    return space
+
+
 class RayExecutor(object):
     name = "Ray"
 
@@ -23,36 +48,206 @@ class RayExecutor(object):
         self._runner = runner
 
     def parse_search_config(self, search_config: Dict) -> Dict:
-        for hyperparameter, val in search_config.items():
-            if not isinstance(val, dict):
-                ray_sampler = val
-            elif val['sampling strategy'] == 'loguniform':
-                low, high = val['bounds'][0], val['bounds'][1]
-                ray_sampler = RandomSearch.random_loguniform(low, high)
-            elif val['sampling strategy'] == 'integer':
-                low, high = val['bounds'][0], val['bounds'][1]
-                ray_sampler = RandomSearch.random_integer(low, high)
-            elif val['sampling strategy'] == 'choice':
-                ray_sampler = RandomSearch.random_choice(val['choices'])
-            elif val['sampling strategy'] == 'uniform':
-                low, high = val['bounds'][0], val['bounds'][1]
-                ray_sampler = RandomSearch.random_uniform(low, high)
-            else:
-                raise KeyError(f"sampling strategy {val['sampling strategy']} does not exist")
-            search_config[hyperparameter] = ray_sampler
+        search_config.update(_map_search_space(search_config, {
+                "loguniform": lambda name, val: RandomSearch.random_loguniform(*val['bounds'][:2]),
+                "integer": lambda name, val: RandomSearch.random_integer(*val['bounds'][:2]),
+                "choice": lambda name, val: RandomSearch.random_choice(val['choices']),
+                "uniform": lambda name, val: RandomSearch.random_uniform(*val['bounds'][:2]),
+        }))
         return search_config
 
+    def gpus_per_trial(self, args: argparse.Namespace) -> float:
+        """
+        number of GPUs Ray reserves for each trial. A fraction of a GPU packs several trials
+        on one device, e.g. ``--trials-per-gpu 4`` (or ``--gpus-per-trial 0.25``) runs four
+        trials on each GPU. Without GPUs, trials fall back to the CPU.
+        """
+        gpus_per_trial = args.gpus_per_trial
+        trials_per_gpu = args.trials_per_gpu
+        if trials_per_gpu:
+            gpus_per_trial = 1.0 / trials_per_gpu
+        if gpus_per_trial < 0:
+            raise ValueError(f"Invalid number of GPUs per trial {gpus_per_trial}")
+        if gpus_per_trial > 1 and not float(gpus_per_trial).is_integer():
+            raise ValueError(f"Trials using more than one GPU must use a whole number of GPUs, got {gpus_per_trial}")
+        if args.num_gpus == 0 and gpus_per_trial > 0:
+            logger.warning("No GPUs available to the experiment, running trials on CPU.")
+            gpus_per_trial = 0
+        return gpus_per_trial
+
+    def get_scheduler(self, args: argparse.Namespace) -> Optional[TrialScheduler]:
+        """
+        trial scheduler that stops poorly performing trials early, based on the metrics
+        reported after every epoch. Returns ``None`` to run every trial to completion.
+        """
+        scheduler = args.scheduler
+        if scheduler == "fifo":
+            return None
+        if scheduler in ("asha", "hyperband"):
+            # Synchronous HyperBand pauses and resumes trials, which function trainables
+            # cannot do, so HyperBand runs as asynchronous successive halving over brackets.
+            return AsyncHyperBandScheduler(
+                time_attr="training_iteration",
+                metric=args.metric,
+                mode=args.mode,
+                max_t=args.max_t,
+                grace_period=args.grace_period,
+                reduction_factor=args.reduction_factor,
+                brackets=1 if scheduler == "asha" else args.brackets,
+            )
+        if scheduler == "median":
+            # An infinite time slice keeps the rule from pausing trials while too few
+            # have finished, as function trainables cannot be paused.
+            return MedianStoppingRule(
+                time_attr="training_iteration",
+                metric=args.metric,
+                mode=args.mode,
+                grace_period=args.grace_period,
+                min_time_slice=float("inf"),
+                hard_stop=True,
+            )
+        raise KeyError(f"scheduler {scheduler} does not exist")
+
+    def hyperopt_search_space(self, search_config: Dict) -> Dict:
+        """
+        map the sampled hyperparameters of a search space onto a HyperOpt space, with the
+        integer bounds of ``RandomSearch.random_integer``.
+        """
+        try:
+            from hyperopt import hp
+            from hyperopt.pyll import scope
+        except ImportError:
+            raise ImportError("The hyperopt search strategy requires hyperopt, install it with `pip install hyperopt`.")
+        return _map_search_space(search_config, {
+                "loguniform": lambda name, val: hp.loguniform(name, *np.log(val['bounds'][:2])),
+                "integer": lambda name, val: scope.int(hp.quniform(name, val['bounds'][0], val['bounds'][1] - 1, 1)),
+                "choice": lambda name, val: hp.choice(name, val['choices']),
+                "uniform": lambda name, val: hp.uniform(name, *val['bounds'][:2]),
+        })
+
+    def skopt_search_space(self, search_config: Dict) -> Dict:
+        """
+        map the sampled hyperparameters of a search space onto scikit-optimize dimensions,
+        with the integer bounds of ``RandomSearch.random_integer``.
+        """
+        try:
+            from skopt.space import Categorical, Integer, Real
+        except ImportError:
+            raise ImportError("The skopt search strategy requires scikit-optimize, "
+                              "install it with `pip install scikit-optimize`.")
+        return _map_search_space(search_config, {
+                "loguniform": lambda name, val: Real(*val['bounds'][:2], prior="log-uniform"),
+                "integer": lambda name, val: Integer(val['bounds'][0], val['bounds'][1] - 1),
+                "choice": lambda name, val: Categorical(val['choices']),
+                "uniform": lambda name, val: Real(*val['bounds'][:2]),
+        })
+
+    def get_search_algorithm(self, args: argparse.Namespace, search_config: Dict) -> Optional[Searcher]:
+        """
+        model-based search algorithm that suggests the sampled hyperparameters of each
+        trial from the results of the previous ones, optimizing ``args.metric``.
+        Returns ``None`` for Ray-Tune's default random variant generation.
+        """
+        search_strategy = args.search_strategy
+        if search_strategy == "variant-generation" or search_strategy in DESIGNS:
+            return None
+        if search_strategy == "hyperopt":
+            from ray.tune.suggest.hyperopt import HyperOptSearch
+            searcher = HyperOptSearch(self.hyperopt_search_space(search_config),
+                                      metric=args.metric,
+                                      mode=args.mode,
+                                      random_state_seed=args.random_seed)
+        elif search_strategy == "skopt":
+            from ray.tune.suggest.skopt import SkOptSearch
+            from skopt import Optimizer
+            space = self.skopt_search_space(search_config)
+            searcher = SkOptSearch(Optimizer(list(space.values()), random_state=args.random_seed),
+                                   list(space.keys()),
+                                   metric=args.metric,
+                                   mode=args.mode)
+        else:
+            raise KeyError(f"search strategy {search_strategy} does not exist")
+        if args.max_concurrent > 0:
+            searcher = ConcurrencyLimiter(searcher, max_concurrent=args.max_concurrent)
+        return searcher
+
+    def seeded_design(self, search_config: Dict, num_samples: int, seed: int, distinct: bool = False) -> List[Dict]:
+        """
+        sample every configuration of a sweep up front, each from its own random stream
+        spawned from ``seed`` (see ``RandomSearch.trial_generators``), so that the same
+        seed always yields the same sweep, however its trials are scheduled. With
+        ``distinct``, a trial resamples from its stream while its configuration
+        duplicates that of an earlier trial.
+        """
+        search_space = HyperparameterSearch(**self.parse_search_config(search_config))
+        design, seen = [], set()
+        for rng in RandomSearch.trial_generators(seed, num_samples):
+            for _ in range(MAX_RESAMPLES + 1 if distinct else 1):
+                design_point = search_space.sample(rng)
+                key = json.dumps(design_point, sort_keys=True)
+                if key not in seen:
+                    break
+            seen.add(key)
+            design.append(design_point)
+        return design
+
+    def completed_trials(self, args: argparse.Namespace) -> List[str]:
+        """
+        directories of the trials of the experiment that finished training.
+        """
+        trial_dirs = glob.glob(os.path.join(args.log_dir, args.experiment_name, "run_*"))
+        return sorted(trial_dir for trial_dir in trial_dirs
+                      if os.path.isfile(os.path.join(trial_dir, "trial", "metrics.json")))
+
+    def remove_completed(self, args: argparse.Namespace, design: List[Dict]) -> List[Dict]:
+        """
+        drop the configurations of a design that a trial of the experiment already
+        finished training, so that replaying a sweep only runs what is left of it.
+        Configurations are matched on the design point Tune recorded for each trial.
+        """
+        completed: Counter = Counter()
+        experiment_dir = os.path.join(args.log_dir, args.experiment_name)
+        for trial_dir in self.completed_trials(args):
+            try:
+                with open(os.path.join(trial_dir, EXPR_PARAM_FILE), "r") as params_file:
+                    design_point = json.load(params_file).get(DESIGN_POINT)
+            except (OSError, ValueError):
+                continue
+            if design_point is not None:
+                design_point.pop(RENDERED_CONFIG, None)
+                completed[json.dumps(design_point, sort_keys=True)] += 1
+        remaining = []
+        for design_point in design:
+            # round-trip through JSON, as Tune did when it recorded the design point
+            key = json.dumps(json.loads(json.dumps(design_point)), sort_keys=True)
+            if completed[key] > 0:
+                completed[key] -= 1
+            else:
+                remaining.append(design_point)
+        if len(remaining) < len(design):
+            logger.info(f"Skipping {len(design) - len(remaining)} of {len(design)} trials "
+                        f"that already completed in {experiment_dir}.")
+        return remaining
+
     def run_distributed(
         self,
         run_func: Callable[[Dict[str, Any], StatusReporter], None],
         args: argparse.Namespace,
     ) -> None:
         
-        logger.info(
-            f"Init Ray with {args.num_cpus} CPUs "
-            + f"and {args.num_gpus} GPUs."
-        )
-        ray.init(num_cpus=args.num_cpus, num_gpus=args.num_gpus)
+        address = args.address
+        if address:
+            # the resources of the cluster are those of its nodes
+            logger.info(f"Connecting to Ray cluster at {address}.")
+            ray.init(address=address)
+        else:
+            logger.info(
+                f"Init Ray with {args.num_cpus} CPUs "
+                + f"and {args.num_gpus} GPUs."
+            )
+            ray.init(num_cpus=args.num_cpus, num_gpus=args.num_gpus)
+        if 0 < args.gpus_per_trial < 1:
+            logger.info(f"Packing up to {int(1 / args.gpus_per_trial)} trials on each GPU.")
 
         run_func = self._runner.get_run_func(args)
         register_trainable("run", run_func)
@@ -60,7 +255,46 @@ class RayExecutor(object):
         with open(args.search_space) as f:
             search_config = json.load(f)
 
-        search_config = self.parse_search_config(search_config)
+        num_samples = args.num_samples
+        search_strategy = args.search_strategy
+        seed = args.random_seed
+        num_completed = 0
+        if args.resume:
+            # completed trials count against the sample budget
+            num_completed = len(self.completed_trials(args))
+            logger.info(f"Resuming experiment '{args.experiment_name}', "
+                        f"{num_completed} of {num_samples} trials already completed.")
+        search_algorithm = self.get_search_algorithm(args, search_config)
+        design = None
+        if search_strategy in DESIGNS or (search_algorithm is None and seed is not None):
+            if search_strategy in DESIGNS:
+                design = DESIGNS[search_strategy](search_config, num_samples, seed=seed)
+            else:
+                design = self.seeded_design(search_config, num_samples, seed,
+                                            distinct=args.deduplicate == "resample")
+            design = self.remove_completed(args, design)
+            # unseeded designs differ from run to run, so only their size can be resumed
+            design = design[:max(0, num_samples - num_completed)]
+            if not design:
+                logger.info(f"All trials of experiment '{args.experiment_name}' already completed.")
+                return
+            design = self._runner.render_design(args, design)
+            # every configuration of the design is run exactly once
+            search_config = {DESIGN_POINT: grid_search(design)}
+            num_samples = 1
+        else:
+            num_samples -= num_completed
+            if num_samples <= 0:
+                logger.info(f"All trials of experiment '{args.experiment_name}' already completed.")
+                return
+            if search_algorithm is None:
+                search_config = self.parse_search_config(search_config)
+                # configurations are sampled by the trials, so check one up front
+                self._runner.render_design(args, [HyperparameterSearch(**search_config).sample()])
+            else:
+                # sampled hyperparameters are suggested by the search algorithm
+                search_config = {hyperparameter: val for hyperparameter, val in search_config.items()
+                                 if not isinstance(val, dict)}
         experiments_config = {
             args.experiment_name: {
                 "run": "run",
@@ -70,15 +304,28 @@ class RayExecutor(object):
                 },
                 "config": search_config,
                 "local_dir": args.log_dir,
-                "num_samples": args.num_samples,
+                "num_samples": num_samples,
+                # trial outputs on other nodes are synced back to log_dir, with rsync by default
+                "sync_to_driver": args.sync_command,
+                # failed trials are retried, recovering from their latest checkpoint
+                "max_failures": args.max_failures,
             }
         }
 
-        logger.info(f"Run Configuration: {experiments_config}")
+        scheduler = self.get_scheduler(args)
+
+        if design is not None:
+            # the design holds every rendered training config, too large to log at INFO
+            settings = {key: val for key, val in experiments_config[args.experiment_name].items() if key != "config"}
+            logger.info(f"Run Configuration: {settings}, with {len(design)} design points")
+            logger.debug(f"Design points: {design}")
+        else:
+            logger.info(f"Run Configuration: {experiments_config}")
         try:
             run_experiments(
                 experiments=experiments_config,
-                scheduler=None,
+                search_alg=search_algorithm,
+                scheduler=scheduler,
                 with_server=args.with_server,
                 server_port=args.server_port,
             )
@@ -90,5 +337,6 @@ class RayExecutor(object):
 
     def run(self, args: argparse.Namespace) -> None:
         setattr(args, "cwd", os.getcwd())
+        setattr(args, "gpus_per_trial", self.gpus_per_trial(args))
         run_func = self._runner.get_run_func(args)
         self.run_distributed(run_func, args)
\ No newline at end of file
@@ -0,0 +1,52 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from allennlp.training.trainer import EpochCallback, GradientDescentTrainer
+from ray import tune
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+@EpochCallback.register("tune_report")
+class TuneReportCallback(EpochCallback):
+    """
+    reports the metrics of every epoch to Ray Tune as a training iteration, so that
+    trial schedulers can stop poorly performing trials early and the progress of each
+    trial is visible while it trains.
+
+    Along with the numeric training and validation metrics of the epoch, it reports the
+    wall time of the epoch (``epoch_duration``) and the number of training instances
+    processed per second (``instances_per_second``), when the dataset has a length.
+    """
+
+    def __init__(self) -> None:
+        self._epoch_start_time: Optional[float] = None
+
+    @staticmethod
+    def _num_training_instances(trainer: GradientDescentTrainer) -> Optional[int]:
+        try:
+            return len(trainer.data_loader.dataset)
+        except (AttributeError, TypeError):
+            # lazy datasets have no length
+            return None
+
+    def __call__(
+        self,
+        trainer: GradientDescentTrainer,
+        metrics: Dict[str, Any],
+        epoch: int,
+        is_master: bool,
+    ) -> None:
+        now = time.time()
+        epoch_start_time, self._epoch_start_time = self._epoch_start_time, now
+        # the trainer also calls epoch callbacks once before training, with epoch = -1
+        if epoch < 0 or not is_master:
+            return
+        result = {key: value for key, value in metrics.items() if isinstance(value, (int, float))}
+        if epoch_start_time is not None:
+            result["epoch_duration"] = now - epoch_start_time
+            num_instances = self._num_training_instances(trainer)
+            if num_instances is not None and result["epoch_duration"] > 0:
+                result["instances_per_second"] = num_instances / result["epoch_duration"]
+        tune.report(**result)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Name of the directory in an experiment's log directory that indexes its configurations.
+CONFIG_INDEX_DIR = ".config_index"
+
+
+def config_hash(params: Dict[str, Any]) -> str:
+    """
+    hash of a training configuration, independent of the order of its keys.
+    """
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ConfigIndex:
+    """
+    persistent index of the configurations evaluated in an experiment, with one file per
+    configuration hash recording the directory of the trial that claimed it. Claims are
+    atomic, so concurrent trials on a shared file system never both claim a configuration.
+
+    Example:
+        >> index = ConfigIndex("logs/experiment/.config_index")
+        >> index.claim(config_hash(params), "logs/experiment/run_1")
+            None
+        >> index.claim(config_hash(params), "logs/experiment/run_2")
+            "logs/experiment/run_1"
+    """
+
+    def __init__(self, directory: str) -> None:
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        directory of the trial that claimed the configuration, if any.
+        """
+        try:
+            with open(self._path(key), "r") as entry_file:
+                return json.load(entry_file)["trial_dir"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def claim(self, key: str, trial_dir: str) -> Optional[str]:
+        """
+        record ``trial_dir`` as the trial evaluating the configuration. Returns ``None``
+        if the claim succeeded, and the directory of the earlier trial if the
+        configuration was already claimed (empty while the earlier trial is still
+        writing its claim).
+        """
+        try:
+            fd = os.open(self._path(key), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return self.lookup(key) or ""
+        with os.fdopen(fd, "w") as entry_file:
+            json.dump({"trial_dir": trial_dir}, entry_file)
+        return None
@@ -0,0 +1,69 @@
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+from allentune.util.config_index import config_hash
+
+logger = logging.getLogger(__name__)
+
+# Name of the directory in an experiment's log directory that caches its datasets.
+DATASET_CACHE_DIR = ".dataset_cache"
+
+# Training config keys that determine the instances read and the vocabulary built from them.
+DATASET_KEYS = ("dataset_reader", "validation_dataset_reader", "train_data_path",
+                "validation_data_path", "test_data_path", "evaluate_on_test",
+                "datasets_for_vocab_creation", "vocabulary")
+
+
+def use_dataset_cache(params: Dict[str, Any], cache_dir: str) -> Optional[str]:
+    """
+    point the dataset readers of a training config at a cache of their instances, and its
+    vocabulary at a cached vocabulary, both shared by the trials of an experiment.
+
+    Each reader caches the instances of every file it reads in a directory keyed by its
+    own config, using the ``cache_directory`` of AllenNLP dataset readers, so readers with
+    the same config read their data once per experiment. Lazy readers are not cached.
+    The vocabulary is keyed by the config of the readers, data paths and vocabulary.
+
+    Returns the directory to save the vocabulary of the trial to, with ``save_vocabulary``,
+    if no vocabulary was cached yet, and ``None`` otherwise.
+    """
+    for reader_key in ("dataset_reader", "validation_dataset_reader"):
+        reader = params.get(reader_key)
+        if reader is not None and not reader.get("lazy", False) and "cache_directory" not in reader:
+            reader["cache_directory"] = os.path.join(cache_dir, "instances", config_hash(reader))
+
+    vocabulary = params.get("vocabulary", {})
+    if vocabulary.get("type") in ("from_files", "empty"):
+        return None
+    vocabulary_dir = os.path.join(cache_dir, "vocabulary",
+                                  config_hash({key: params.get(key) for key in DATASET_KEYS}))
+    if not os.path.isdir(vocabulary_dir):
+        return vocabulary_dir
+    logger.info(f"Loading cached vocabulary from {vocabulary_dir}")
+    params["vocabulary"] = {"type": "from_files", "directory": vocabulary_dir}
+    for token_key in ("padding_token", "oov_token"):
+        if token_key in vocabulary:
+            params["vocabulary"][token_key] = vocabulary[token_key]
+    return None
+
+
+def save_vocabulary(serialization_dir: str, vocabulary_dir: str) -> None:
+    """
+    cache the vocabulary a trial saved in its serialization directory. The vocabulary is
+    copied next to the cache and renamed into place, so other trials never load a
+    partially copied vocabulary, and the first trial to finish wins.
+    """
+    os.makedirs(os.path.dirname(vocabulary_dir), exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=os.path.dirname(vocabulary_dir))
+    try:
+        shutil.copytree(os.path.join(serialization_dir, "vocabulary"),
+                        os.path.join(staging_dir, "vocabulary"))
+        os.rename(os.path.join(staging_dir, "vocabulary"), vocabulary_dir)
+    except OSError:
+        # another trial cached the vocabulary first
+        pass
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
@@ -0,0 +1,280 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# CDF mass below which the lower tail of the distribution of the max is dropped.
+# Anything smaller cannot change the expected max in double precision.
+_TAIL_TOLERANCE = np.finfo(np.float64).eps
+
+# Upper bound on the number of (n, i) cells materialized at once.
+_MAX_BLOCK_ELEMENTS = 2 ** 22
+
+_LOG_FACTORIALS = np.zeros(0)
+
+
+def _log_factorials(N: int) -> np.ndarray:
+    """
+    table of ``log(k!)`` for ``k`` in ``0..N``. The table is shared across calls and only
+    ever grows, so curves for several models over the same sweep size reuse it.
+    """
+    global _LOG_FACTORIALS
+    if len(_LOG_FACTORIALS) <= N:
+        # imported here, so that reading cached curves does not pay for scipy
+        import scipy.special
+        _LOG_FACTORIALS = scipy.special.gammaln(np.arange(max(N + 1, 2 * len(_LOG_FACTORIALS))) + 1)
+    return _LOG_FACTORIALS
+
+
+def _pdf_with_replacement(i: np.ndarray, n: np.ndarray, N: int) -> np.ndarray:
+    """
+    probability that the ``i``-th smallest of ``N`` trials is the max of ``n`` draws
+    with replacement, i.e. the difference of the CDF ``(i/N)**n`` at ``i`` and ``i - 1``.
+    """
+    return (i / N) ** n - ((i - 1) / N) ** n
+
+
+def _pdf_without_replacement(i: np.ndarray, n: np.ndarray, N: int) -> np.ndarray:
+    """
+    probability that the ``i``-th smallest of ``N`` trials is the max of ``n`` draws
+    without replacement, ``C(i - 1, n - 1) / C(N, n)``, evaluated in log space so it
+    neither overflows nor loses precision for large ``N``.
+    """
+    log_factorials = _log_factorials(N)
+    feasible = i >= n
+    k = np.where(feasible, i - 1, 0)
+    m = np.where(feasible, n - 1, 0)
+    log_pdf = (log_factorials[k] - log_factorials[m] - log_factorials[k - m]
+               - log_factorials[N] + log_factorials[n] + log_factorials[N - n])
+    return np.where(feasible, np.exp(log_pdf), 0.0)
+
+
+def _window_start(n: int, N: int) -> int:
+    """
+    smallest order statistic (1-indexed) that can carry non-negligible probability of
+    being the max of ``n`` draws. Below it, ``(i/N)**n`` is under ``_TAIL_TOLERANCE``,
+    and ``(i/N)**n`` bounds the CDF of the max both with and without replacement.
+    """
+    return max(1, int(np.floor(N * _TAIL_TOLERANCE ** (1.0 / n))))
+
+
+def _pdf_blocks(N: int, pdf: Callable[[np.ndarray, np.ndarray, int], np.ndarray],
+                first_n: int = 1, last_n: Optional[int] = None) -> Iterable[Tuple[int, np.ndarray]]:
+    """
+    yield the distribution of the max of ``n`` draws from ``N`` sorted trials, for
+    consecutive blocks of ``n`` from ``first_n`` to ``last_n`` (``N`` by default), along
+    with the first order statistic of its window.
+
+    Each block evaluates the distribution over the order statistics that matter for its
+    smallest ``n``. Blocks at most double ``n``, so the window shrinks as fast as the
+    block grows and the total work is O(N log N) cells, with at most
+    ``_MAX_BLOCK_ELEMENTS`` cells in memory at any time.
+    """
+    last_n = N if last_n is None else last_n
+    n = first_n
+    while n <= last_n:
+        start = _window_start(n, N)
+        width = N - start + 1
+        rows = max(1, min(n, _MAX_BLOCK_ELEMENTS // width))
+        ns = np.arange(n, min(n + rows, last_n + 1))
+        i = np.arange(start, N + 1)
+        yield start, pdf(i[np.newaxis, :], ns[:, np.newaxis], N)
+        n = ns[-1] + 1
+
+
+def _expected_max_blocks(performance: np.ndarray,
+                         pdf: Callable[[np.ndarray, np.ndarray, int], np.ndarray]
+                         ) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+    """
+    yield the expected max and its standard error for consecutive blocks of ``n``, each
+    reduced against the sorted performance with a single matrix-vector product.
+    """
+    for start, pdfs in _pdf_blocks(len(performance), pdf):
+        window = performance[start - 1:]
+        means = pdfs @ window
+        variances = np.einsum("ij,ij->i", pdfs, (window[np.newaxis, :] - means[:, np.newaxis]) ** 2)
+        yield means, np.sqrt(variances)
+
+
+def samplemax(validation_performance: Iterable[float], with_replacement: bool = True) -> Dict:
+    """
+    expected maximum validation performance after ``n`` hyperparameter assignments, for
+    every ``n`` from 1 to the number of observed trials, along with the standard error of
+    the max (what the std dev of the bootstrap estimates of the mean of the max converges
+    to, see the last sentence of the summary on page 10 of
+    http://www.stat.cmu.edu/~larry/=stat705/Lecture13.pdf).
+
+    By default the ``n`` assignments are drawn with replacement from the observed trials;
+    ``with_replacement=False`` draws them from the observed trials as a finite pool.
+
+    Example:
+        >> samplemax([0.5, 0.7, 0.6])
+            {"mean": [0.6, 0.6444..., 0.6666...], "var": [0.0816..., 0.0684..., 0.0544...], "max": 0.7}
+    """
+    performance = np.sort(np.asarray(list(validation_performance), dtype=np.float64))
+    if with_replacement:
+        pdf = _pdf_with_replacement
+    else:
+        pdf = _pdf_without_replacement
+    means, variances = [], []
+    for block_means, block_variances in _expected_max_blocks(performance, pdf):
+        means.append(block_means)
+        variances.append(block_variances)
+    return {"mean": np.concatenate(means).tolist(),
+            "var": np.concatenate(variances).tolist(),
+            "max": np.max(performance)}
+
+
+def bootstrap_samplemax(validation_performance: Iterable[float],
+                        num_bootstrap: int = 1000,
+                        confidence: float = 0.95,
+                        with_replacement: bool = True,
+                        seed: Optional[int] = None) -> Dict:
+    """
+    expected maximum validation performance after ``n`` hyperparameter assignments, as
+    in ``samplemax``, with a percentile bootstrap confidence interval at level
+    ``confidence``. Each of the ``num_bootstrap`` replicates resamples the observed
+    trials with replacement and computes its own expected max curve.
+
+    The curves of all replicates are only held for a block of ``n`` at a time, and
+    replicates are resampled, sorted and reduced against the distribution of the max in
+    chunks, so that neither holds more than about ``_MAX_BLOCK_ELEMENTS`` values. When
+    the ``N`` by ``num_bootstrap`` curves do not fit in one block, every block draws the
+    same replicates again, trading time for memory. Unlike the standard error of
+    ``samplemax``, the interval never exceeds the best observed performance.
+
+    Example:
+        >> bootstrap_samplemax([0.5, 0.7, 0.6], num_bootstrap=1000, seed=0)
+            {"mean": [0.6, 0.6444..., 0.6666...], "lower": [...], "upper": [...], "max": 0.7}
+    """
+    performance = np.asarray(list(validation_performance), dtype=np.float64)
+    N = len(performance)
+    if with_replacement:
+        pdf = _pdf_with_replacement
+    else:
+        pdf = _pdf_without_replacement
+    seed_sequence = np.random.SeedSequence(seed)
+    chunksize = max(1, _MAX_BLOCK_ELEMENTS // N)
+    block_rows = max(1, _MAX_BLOCK_ELEMENTS // num_bootstrap)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.empty(N), np.empty(N)
+    for first_n in range(1, N + 1, block_rows):
+        last_n = min(first_n + block_rows - 1, N)
+        curves = np.empty((last_n - first_n + 1, num_bootstrap))
+        # every block of n sees the same replicates
+        rng = np.random.default_rng(seed_sequence)
+        for first in range(0, num_bootstrap, chunksize):
+            last = min(first + chunksize, num_bootstrap)
+            # one replicate per column, sorted to order statistics. Replicates are drawn
+            # one after the other, so they do not depend on the chunk size.
+            replicates = np.sort(performance[rng.integers(0, N, (last - first, N)).T], axis=0)
+            row = 0
+            for start, pdfs in _pdf_blocks(N, pdf, first_n, last_n):
+                curves[row:row + len(pdfs), first:last] = pdfs @ replicates[start - 1:]
+                row += len(pdfs)
+        lower[first_n - 1:last_n], upper[first_n - 1:last_n] = np.quantile(curves, [alpha, 1 - alpha], axis=1)
+    return {"mean": samplemax(performance, with_replacement)["mean"],
+            "lower": lower.tolist(),
+            "upper": upper.tolist(),
+            "max": np.max(performance)}
+
+
+def expected_max_curves(validation_performance: Dict[str, Sequence[float]],
+                        num_bootstrap: int = 0,
+                        confidence: float = 0.95,
+                        with_replacement: bool = True,
+                        seed: Optional[int] = None,
+                        workers: int = 1) -> Dict[str, Dict]:
+    """
+    expected max curves of several models, keyed by model. With ``num_bootstrap``
+    replicates, the curves carry bootstrap confidence intervals (see
+    ``bootstrap_samplemax``). With more than one worker, models are computed in parallel
+    in a process pool.
+    """
+    if num_bootstrap > 0:
+        curve = partial(bootstrap_samplemax, num_bootstrap=num_bootstrap, confidence=confidence,
+                        with_replacement=with_replacement, seed=seed)
+    else:
+        curve = partial(samplemax, with_replacement=with_replacement)
+    models = list(validation_performance)
+    performances = [list(validation_performance[model]) for model in models]
+    if workers > 1 and len(models) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            curves = list(executor.map(curve, performances))
+    else:
+        curves = [curve(performance) for performance in performances]
+    return dict(zip(models, curves))
+
+
+def expected_max_budget(validation_performance: Sequence[float],
+                        durations: Sequence[float],
+                        num_workers: int = 1,
+                        budgets: Optional[Sequence[float]] = None,
+                        num_simulations: int = 1000,
+                        seed: Optional[int] = None) -> Dict:
+    """
+    expected maximum validation performance of the trials completed within a wall-clock
+    ``budget``, when ``num_workers`` workers each run trials one after the other. Trials
+    are drawn with replacement from the observed trials, keeping each trial's actual
+    duration, so that fast and slow configurations finish as often as they did in the
+    sweep. The compute budget is ``budget * num_workers`` worker-hours.
+
+    Workers draw trials independently, so each worker is simulated ``num_simulations``
+    times: the completion times of its trials are cumulative sums of their durations, and
+    the best performance by each budget is a running max, bucketed into the budgets with
+    a sorted search. The expected max over the workers then follows from the sorted
+    single-worker results, as in ``samplemax``. Budgets at which no trial has completed
+    with positive probability report the expected max given that one has.
+
+    By default, the budgets are 100 points up to the time the observed sweep would take on
+    ``num_workers`` workers.
+
+    Example:
+        >> expected_max_budget([0.5, 0.7, 0.6], [60, 600, 120], num_workers=2, budgets=[60, 600], seed=0)
+            {"budget": [60.0, 600.0], "mean": [0.5, 0.6523...], "max": 0.7}
+    """
+    performance = np.asarray(list(validation_performance), dtype=np.float64)
+    durations = np.asarray(list(durations), dtype=np.float64)
+    N = len(performance)
+    if np.any(durations < 0) or not np.any(durations > 0):
+        raise ValueError("Trial durations must be non-negative, and not all zero.")
+    if budgets is None:
+        budgets = np.linspace(0, np.sum(durations) / num_workers, 101)[1:]
+    budgets = np.asarray(budgets, dtype=np.float64)
+    T = len(budgets)
+    rng = np.random.default_rng(seed)
+    # best performance of each simulated worker among its trials completed in each budget bin
+    best = np.full((num_simulations, T), -np.inf)
+    elapsed = np.zeros(num_simulations)
+    running_best = np.full(num_simulations, -np.inf)
+    rows = np.arange(num_simulations)[:, np.newaxis]
+    chunksize = max(1, _MAX_BLOCK_ELEMENTS // num_simulations)
+    while np.min(elapsed) <= budgets[-1]:
+        trials = rng.integers(0, N, (num_simulations, chunksize))
+        completion_times = elapsed[:, np.newaxis] + np.cumsum(durations[trials], axis=1)
+        bests = np.maximum(running_best[:, np.newaxis], np.maximum.accumulate(performance[trials], axis=1))
+        # the first budget each trial completes within, non-decreasing along a row
+        bins = np.searchsorted(budgets, completion_times, side='left')
+        keys = (rows * (T + 1) + bins).ravel()
+        # the running best is non-decreasing too, so the last trial of a bin holds its best
+        last = np.append(keys[1:] != keys[:-1], True)
+        in_budget = last & (bins.ravel() < T)
+        flat_rows, flat_bins = np.divmod(keys[in_budget], T + 1)
+        best[flat_rows, flat_bins] = np.maximum(best[flat_rows, flat_bins], bests.ravel()[in_budget])
+        elapsed = completion_times[:, -1]
+        running_best = bests[:, -1]
+    best = np.sort(np.maximum.accumulate(best, axis=1), axis=0)
+    # distribution of the max over the workers of each budget's sorted single-worker bests
+    i = np.arange(1, num_simulations + 1)
+    pdf = _pdf_with_replacement(i, num_workers, num_simulations)
+    completed = np.isfinite(best)
+    none_completed = (np.sum(~completed, axis=0) / num_simulations) ** num_workers
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (pdf @ np.where(completed, best, 0.0)) / (1 - none_completed)
+    return {"budget": budgets.tolist(),
+            "mean": np.where(none_completed < 1, means, np.nan).tolist(),
+            "max": np.max(performance)}
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from allentune.util.expected_max import expected_max_budget, expected_max_curves
+from allentune.util.result_files import read_results
+
+logger = logging.getLogger(__name__)
+
+# Directory of cached expected max curves, overridden by the ALLENTUNE_CACHE_DIR environment variable.
+DEFAULT_CACHE_DIR = os.environ.get("ALLENTUNE_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "allentune", "expected_max"))
+
+# Version of the cached curves, bumped when the estimators change their results.
+CACHE_VERSION = 1
+
+
+def file_hash(path: str, block_size: int = 2 ** 20) -> str:
+    """
+    hash of the content of a file, read in blocks.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _to_json(curves: Dict[str, Dict]) -> Dict[str, Dict]:
+    return {str(model): {key: value.tolist() if isinstance(value, np.ndarray) else
+                    float(value) if isinstance(value, np.floating) else value
+                    for key, value in curve.items()}
+            for model, curve in curves.items()}
+
+
+def compute_expected_max(result_file: str,
+                         performance_metric_field: str = "best_validation_accuracy",
+                         model_field: str = "model",
+                         duration_field: str = "training_duration",
+                         num_bootstrap: int = 0,
+                         confidence: float = 0.95,
+                         with_replacement: bool = True,
+                         x_axis_time: bool = False,
+                         parallel_workers: int = 1,
+                         seed: Optional[int] = 0,
+                         workers: int = 1,
+                         dataset_field: Optional[str] = None,
+                         dataset: Any = None,
+                         cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Dict[str, Dict]:
+    """
+    expected max curves of every model of a result file, keyed by model, as computed by
+    ``samplemax`` or, with ``num_bootstrap`` replicates, ``bootstrap_samplemax``. With
+    ``x_axis_time``, the curves are over wall-clock budgets instead, as computed by
+    ``expected_max_budget`` for ``parallel_workers`` parallel trials. With a
+    ``dataset_field``, only the trials whose ``dataset_field`` is ``dataset`` are used.
+
+    Curves are cached in ``cache_dir``, keyed by the content of the result file and the
+    estimator settings, so that they are computed once per sweep. ``cache_dir=None``
+    disables the cache.
+
+    Example:
+        >> compute_expected_max("logs/classifier_search/results.jsonl")
+            {"cnn": {"mean": [...], "var": [...], "max": 0.89}, "lstm": {...}}
+    """
+    settings = {"performance_metric_field": performance_metric_field,
+                "model_field": model_field,
+                "with_replacement": with_replacement}
+    if dataset_field is not None:
+        settings.update(dataset_field=dataset_field, dataset=dataset)
+    if x_axis_time:
+        settings.update(duration_field=duration_field, parallel_workers=parallel_workers, seed=seed)
+    elif num_bootstrap > 0:
+        settings.update(num_bootstrap=num_bootstrap, confidence=confidence, seed=seed)
+    cache_file = None
+    if cache_dir is not None:
+        key = json.dumps({"version": CACHE_VERSION, "file": file_hash(result_file), "settings": settings},
+                         sort_keys=True, default=str)
+        cache_file = os.path.join(cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+        if os.path.isfile(cache_file):
+            logger.info(f"Loading cached expected max curves of {result_file} from {cache_file}")
+            with open(cache_file, "r") as f:
+                return json.load(f)
+
+    columns = [model_field, performance_metric_field] + ([duration_field] if x_axis_time else [])
+    if dataset_field is not None:
+        results = read_results(result_file, columns=columns + [dataset_field])
+        results = results[results[dataset_field] == dataset]
+    else:
+        results = read_results(result_file, columns=columns)
+    if x_axis_time:
+        curves = {model: expected_max_budget(group[performance_metric_field], group[duration_field],
+                                             num_workers=parallel_workers, seed=seed)
+                  for model, group in results.groupby(model_field)}
+    else:
+        performance = {model: group.tolist() for model, group in results.groupby(model_field)[performance_metric_field]}
+        curves = expected_max_curves(performance, num_bootstrap=num_bootstrap, confidence=confidence,
+                                     with_replacement=with_replacement, seed=seed, workers=workers)
+    curves = _to_json(curves)
+
+    if cache_file is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # written to a temporary file first, so that readers never see a partial cache
+        with open(cache_file + ".tmp", "w") as f:
+            json.dump(curves, f)
+        os.replace(cache_file + ".tmp", cache_file)
+    return curves
+
+
+def curves_table(curves: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """
+    long table of expected max curves, with one row per model and number of
+    hyperparameter assignments ``n`` (or wall-clock ``budget``).
+    """
+    tables: List[pd.DataFrame] = []
+    for model, curve in curves.items():
+        columns = {key: value for key, value in curve.items() if isinstance(value, list)}
+        table = pd.DataFrame(columns)
+        if "budget" not in table.columns:
+            table.insert(0, "n", np.arange(1, len(table) + 1))
+        table.insert(0, "model", model)
+        table["max"] = curve["max"]
+        tables.append(table)
+    return pd.concat(tables, axis=0, ignore_index=True)
@@ -1,45 +1,78 @@
 import logging
 import os
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
-import ray
 
 # Create a custom logger
 logger = logging.getLogger(__name__)
 
 
 class RandomSearch:
+    """
+    Samplers for each sampling strategy of a search space. Every sampler optionally takes
+    a ``size``, to draw that many samples at once as an array, and a ``numpy.random.Generator``
+    ``rng`` to draw from instead of the global ``np.random`` state.
+    """
+
+    @staticmethod
+    def trial_generators(seed: int, num_trials: int) -> List[np.random.Generator]:
+        """
+        independent random number generators, one per trial, spawned from a single seed.
+        The generator of a trial depends only on the seed and the trial's index, so a
+        sweep can be replayed exactly, and trials never share a random stream.
+        """
+        return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(num_trials)]
 
     @staticmethod
     def random_choice(args: List[Any], n: int = 1):
         """
-        pick a random element from a set.
+        pick a random element from a set. The sampler optionally takes a ``size``, to
+        draw that many samples at once as an array.
         
         Example:
             >> sampler = RandomSearch.random_choice(1,2,3)
             >> sampler()
                 2
+            >> sampler(4)
+                array([3, 1, 1, 2])
         """
         choices = []
         for arg in args:
             choices.append(arg)
         if n == 1:
-            return lambda: np.random.choice(choices, replace=False)
+            return lambda size=None, rng=None: (np.random if rng is None else rng).choice(choices, size)
         else:
-            return lambda: np.random.choice(choices, n, replace=False)
+            def sampler(size=None, rng=None):
+                random = np.random if rng is None else rng
+                if size is None:
+                    return random.choice(choices, n, replace=False)
+                # n distinct choices per sample: the first n of a random permutation
+                indices = np.argsort(random.random((size, len(choices))), axis=1)[:, :n]
+                return np.array(choices)[indices]
+            return sampler
 
     @staticmethod
     def random_integer(low: Union[int, float], high: Union[int, float]):
         """
-        pick a random integer between two bounds
+        pick a random integer from ``[low, high)``: the upper bound is excluded. The
+        ``integer`` sampling strategy of search spaces follows this convention everywhere,
+        in designs and in the hyperopt and skopt search spaces.
         
         Example:
             >> sampler = RandomSearch.random_integer(1, 10)
             >> sampler()
                 9
+            >> sampler(3)
+                array([2, 7, 7])
         """
-        return lambda: int(np.random.randint(low, high))
+        def sampler(size=None, rng=None):
+            if rng is None:
+                samples = np.random.randint(low, high, size)
+            else:
+                samples = rng.integers(low, high, size)
+            return int(samples) if size is None else samples
+        return sampler
 
     @staticmethod
     def random_loguniform(low: Union[float, int], high: Union[float, int]):
@@ -51,7 +84,7 @@ class RandomSearch:
             >> sampler()
                 0.0004
         """
-        return lambda: np.exp(np.random.uniform(np.log(low), np.log(high)))
+        return lambda size=None, rng=None: np.exp((np.random if rng is None else rng).uniform(np.log(low), np.log(high), size))
 
     @staticmethod
     def random_uniform(low: Union[float, int], high: Union[float, int]):
@@ -63,7 +96,76 @@ class RandomSearch:
             >> sampler()
                 0.01
         """
-        return lambda: np.random.uniform(low, high)
+        return lambda size=None, rng=None: (np.random if rng is None else rng).uniform(low, high, size)
+
+    @staticmethod
+    def from_unit_interval(val: Dict, unit_samples: np.ndarray) -> List[Any]:
+        """
+        map samples from the unit interval through the sampling strategy of a
+        hyperparameter, so that uniform samples become samples of the strategy, with
+        the integer bounds of ``random_integer``.
+
+        Example:
+            >> RandomSearch.from_unit_interval({"sampling strategy": "integer", "bounds": [3, 6]}, np.array([0.1, 0.9]))
+                [3, 5]
+        """
+        if val['sampling strategy'] == 'choice':
+            indices = np.minimum((unit_samples * len(val['choices'])).astype(int), len(val['choices']) - 1)
+            return [val['choices'][index] for index in indices]
+        low, high = val['bounds'][0], val['bounds'][1]
+        if val['sampling strategy'] == 'loguniform':
+            return np.exp(np.log(low) + unit_samples * (np.log(high) - np.log(low))).tolist()
+        elif val['sampling strategy'] == 'integer':
+            return np.minimum(low + np.floor(unit_samples * (high - low)), high - 1).astype(int).tolist()
+        elif val['sampling strategy'] == 'uniform':
+            return (low + unit_samples * (high - low)).tolist()
+        else:
+            raise KeyError(f"sampling strategy {val['sampling strategy']} does not exist")
+
+    @staticmethod
+    def design(search_config: Dict, unit_samples: np.ndarray) -> List[Dict]:
+        """
+        configurations for the points of a design over the unit hypercube, with one
+        column per sampled hyperparameter of the search space, in order. Constant
+        hyperparameters are copied into every configuration.
+        """
+        sampled = [key for key, val in search_config.items() if isinstance(val, dict)]
+        columns = {key: RandomSearch.from_unit_interval(search_config[key], unit_samples[:, index])
+                   for index, key in enumerate(sampled)}
+        configs = []
+        for row in range(unit_samples.shape[0]):
+            configs.append({key: columns[key][row] if key in columns else val
+                            for key, val in search_config.items()})
+        return configs
+
+    @staticmethod
+    def latin_hypercube_design(search_config: Dict, num_samples: int, seed: Optional[int] = None) -> List[Dict]:
+        """
+        ``num_samples`` configurations from a Latin hypercube design: the range of every
+        sampled hyperparameter is split into ``num_samples`` equally likely strata, and
+        each stratum is sampled exactly once.
+        """
+        rng = np.random.default_rng(seed)
+        num_sampled = sum(isinstance(val, dict) for val in search_config.values())
+        strata = np.argsort(rng.random((num_samples, num_sampled)), axis=0)
+        unit_samples = (strata + rng.random((num_samples, num_sampled))) / num_samples
+        return RandomSearch.design(search_config, unit_samples)
+
+    @staticmethod
+    def sobol_design(search_config: Dict, num_samples: int, seed: Optional[int] = None) -> List[Dict]:
+        """
+        ``num_samples`` configurations from a scrambled Sobol sequence, which covers the
+        search space more evenly than independent samples. Sobol sequences are balanced
+        for powers of two, so ``num_samples`` should preferably be one.
+        """
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise ImportError("Sobol designs require scipy >= 1.7.")
+        num_sampled = sum(isinstance(val, dict) for val in search_config.values())
+        sampler = qmc.Sobol(d=max(num_sampled, 1), scramble=True, seed=seed)
+        unit_samples = sampler.random(num_samples)[:, :num_sampled]
+        return RandomSearch.design(search_config, unit_samples)
 
 
 class HyperparameterSearch:
@@ -74,38 +176,64 @@ class HyperparameterSearch:
         for key, val in kwargs.items():
             self.search_space[key] = val
 
-    def parse(self, val: Any):
+    def parse(self, val: Any, rng: Optional[np.random.Generator] = None):
         if isinstance(val, type(lambda x: x)):
-            val = val()
-            if isinstance(val, (int, np.int)):
-                return int(val)
-            elif isinstance(val, (float, np.float)):
-                return val
-            elif isinstance(val, (np.ndarray, list)):
-                return " ".join(val)
-            else:
-                return val
-        elif isinstance(val, (int, np.int)):
+            val = val() if rng is None else val(rng=rng)
+        # bool is a subclass of int, so constant booleans become 1 or 0, as they always have
+        if isinstance(val, (int, np.integer)):
             return int(val)
-        elif isinstance(val, (float, np.float)):
-            return val
+        elif isinstance(val, (float, np.floating)):
+            return float(val)
+        elif isinstance(val, np.str_):
+            return str(val)
         elif isinstance(val, (np.ndarray, list)):
-            return " ".join(val)
+            return " ".join(str(item) for item in val)
         elif val is None:
             return None
         else:
             return val
 
+    def parse_batch(self, val: Any, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        ``n`` samples of a hyperparameter as an array: a single call to a sampler, or a
+        constant repeated ``n`` times. Samplers that draw several elements per sample
+        are joined into strings, as in ``parse``.
+        """
+        if isinstance(val, type(lambda x: x)):
+            try:
+                column = np.asarray(val(n) if rng is None else val(n, rng=rng))
+            except TypeError:
+                # samplers that do not take a size are called once per sample
+                return np.array([self.parse(val, rng) for _ in range(n)])
+            if column.ndim > 1:
+                return np.array([" ".join(str(item) for item in row) for row in column])
+            return column
+        parsed = self.parse(val)
+        column = np.empty(n, dtype=object if parsed is None or isinstance(parsed, str) else type(parsed))
+        column[:] = parsed
+        return column
+
+    def sample_batch(self, n: int, rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        """
+        draw ``n`` configurations at once, column-oriented: one array of ``n`` values per
+        hyperparameter, each drawn with a single vectorized call to its sampler. Samples
+        are drawn from ``rng`` if given, and from the global ``np.random`` state otherwise.
 
-    def sample(self) -> Dict:
-        res = {}
+        Example:
+            >> search = HyperparameterSearch(LR=RandomSearch.random_loguniform(1e-5, 1e-2), EPOCHS=10)
+            >> search.sample_batch(3)
+                {"LR": array([0.0004, 0.0071, 0.00002]), "EPOCHS": array([10, 10, 10])}
+        """
+        batch = {}
         for key, val in self.search_space.items():
             try:
-                res[key] = self.parse(val)
+                batch[key] = self.parse_batch(val, n, rng)
             except TypeError as error:
                 logger.error(f"Could not parse key {key} with value {val}. {error}")
+        return batch
 
-        return res
+    def sample(self, rng: Optional[np.random.Generator] = None) -> Dict:
+        return {key: self.parse(column[0]) for key, column in self.sample_batch(1, rng).items()}
 
     def update_environment(self, sample) -> None:
         for key, val in sample.items():
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Result file formats, keyed by file extension. Parquet and Arrow IPC (feather) files
+# are columnar, so readers can load only the columns they need; they require pyarrow.
+RESULT_FORMATS = {".jsonl": "jsonl", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+RESULT_EXTENSIONS = {"jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrow"}
+
+
+def result_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result file format {extension} for {path}, "
+                         f"expected one of {', '.join(RESULT_FORMATS)}")
+    return RESULT_FORMATS[extension]
+
+
+def columnar_formats_available() -> bool:
+    try:
+        import pyarrow  # pylint: disable=unused-import
+    except ImportError:
+        return False
+    return True
+
+
+def _require_pyarrow(path: str) -> None:
+    if not columnar_formats_available():
+        raise ImportError(f"Reading or writing {path} requires pyarrow. "
+                          "Install it with `pip install pyarrow`, or use a .jsonl result file.")
+
+
+def _read_jsonl_columns(path: str, columns: List[str]) -> pd.DataFrame:
+    """
+    stream a JSON lines file, keeping only ``columns`` of each record, so that wide
+    flattened configs are never materialized.
+    """
+    rows = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                rows.append([record.get(column) for column in columns])
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def read_results(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    read a result file written by ``allentune report`` or ``allentune merge``. If
+    ``columns`` is given, only those columns are loaded. Columnar files are memory-mapped.
+    """
+    file_format = result_format(path)
+    if file_format == "jsonl":
+        if columns is None:
+            return pd.read_json(path, lines=True, precise_float=True)
+        return _read_jsonl_columns(path, columns)
+    _require_pyarrow(path)
+    if file_format == "parquet":
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    import pyarrow.feather
+    return pyarrow.feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def write_results(df: pd.DataFrame, path: str) -> None:
+    file_format = result_format(path)
+    if file_format == "jsonl":
+        df.to_json(path, lines=True, orient='records')
+        return
+    _require_pyarrow(path)
+    df = df.reset_index(drop=True)
+    if file_format == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+
+
+def append_results(df: pd.DataFrame, path: str) -> None:
+    """
+    add rows to an existing result file. JSON lines files are appended to in place,
+    columnar files are rewritten.
+    """
+    if result_format(path) == "jsonl":
+        with open(path, 'a') as f:
+            f.write(df.to_json(lines=True, orient='records').rstrip("\n") + "\n")
+    else:
+        write_results(pd.concat([read_results(path), df], axis=0, ignore_index=True), path)
+
+
+def iter_results(path: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    """
+    read a result file in chunks of at most ``chunksize`` rows (or one record batch, for
+    Arrow IPC files), so that files larger than memory can be processed.
+    """
+    file_format = result_format(path)
+    if file_format == "jsonl":
+        with pd.read_json(path, lines=True, precise_float=True, chunksize=chunksize) as reader:
+            yield from reader
+        return
+    _require_pyarrow(path)
+    import pyarrow
+    if file_format == "parquet":
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        with pyarrow.memory_map(path) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index).to_pandas()
+
+
+def _chunk_schema(chunk: pd.DataFrame):
+    import pyarrow
+    # columns that are entirely null in this chunk say nothing about their type
+    chunk = chunk.dropna(axis=1, how='all')
+    return pyarrow.Schema.from_pandas(chunk, preserve_index=False).remove_metadata()
+
+
+def _unify_schemas(schemas):
+    import pyarrow
+    try:
+        return pyarrow.unify_schemas(schemas, promote_options="permissive")
+    except TypeError as error:
+        # ArrowTypeError is a TypeError too, for types that cannot be promoted
+        if isinstance(error, pyarrow.ArrowException):
+            raise
+        # pyarrow < 14 cannot promote types, only null fields
+        return pyarrow.unify_schemas(schemas)
+
+
+def _conflicting_column(schemas) -> Optional[str]:
+    import pyarrow
+    for name in dict.fromkeys(field.name for schema in schemas for field in schema):
+        try:
+            _unify_schemas([pyarrow.schema([schema.field(name)]) for schema in schemas if name in schema.names])
+        except (pyarrow.ArrowTypeError, pyarrow.ArrowInvalid):
+            return name
+    return None
+
+
+def unify_result_schemas(paths: List[str], chunksize: int = 10000, with_types: bool = False):
+    """
+    union of the columns of several result files, in order of first appearance. Only
+    one chunk is held in memory at a time. With ``with_types``, returns a pyarrow schema
+    whose field types are promoted to fit every file, for writing columnar output.
+    """
+    if with_types:
+        _require_pyarrow("columnar result files")
+    columns: Dict[str, None] = {}
+    schemas = []
+    for path in paths:
+        for chunk in iter_results(path, chunksize):
+            columns.update(dict.fromkeys(chunk.columns))
+            if with_types:
+                schemas.append(_chunk_schema(chunk))
+    if not with_types:
+        return list(columns)
+    import pyarrow
+    try:
+        schema = _unify_schemas(schemas)
+    except (pyarrow.ArrowTypeError, pyarrow.ArrowInvalid) as error:
+        raise ValueError(f"Column {_conflicting_column(schemas)} has incompatible types across {', '.join(paths)}, "
+                         "so they cannot be merged into a columnar file. Merge them into a .jsonl file, "
+                         f"or make the column consistent. {error}")
+    fields = {field.name: field for field in schema}
+    return pyarrow.schema([fields.get(column, pyarrow.field(column, pyarrow.null())) for column in columns])
+
+
+class ResultWriter:
+    """
+    incrementally write chunks of results with a fixed set of columns. ``schema`` is the
+    list of columns for JSON lines output, or a pyarrow schema for columnar output (see
+    ``unify_result_schemas``). Chunks are reindexed to those columns, so that columns
+    they lack are written as nulls.
+
+    Example:
+        >> with ResultWriter("merged.parquet", schema) as writer:
+        >>     for chunk in iter_results("results.jsonl"):
+        >>         writer.write(chunk)
+    """
+
+    def __init__(self, path: str, schema) -> None:
+        self._format = result_format(path)
+        self._schema = schema
+        if self._format == "jsonl":
+            self._columns = list(schema)
+            self._file = open(path, 'w')
+        else:
+            _require_pyarrow(path)
+            import pyarrow
+            self._columns = schema.names
+            if self._format == "parquet":
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(path, schema)
+            else:
+                self._writer = pyarrow.ipc.new_file(path, schema)
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        chunk = chunk.reindex(columns=self._columns)
+        if chunk.empty:
+            return
+        if self._format == "jsonl":
+            self._file.write(chunk.to_json(lines=True, orient='records').rstrip("\n") + "\n")
+        else:
+            import pyarrow
+            self._writer.write_table(pyarrow.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+
+    def close(self) -> None:
+        if self._format == "jsonl":
+            self._file.close()
+        else:
+            self._writer.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,61 @@
+import argparse
+import importlib
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from allentune.commands import SUBCOMMANDS
+from allentune.util.result_files import write_results
+
+FIXTURES_ROOT = pathlib.Path(__file__).parent / "fixtures"
+
+
+def _command_args(command, *argv):
+    """
+    arguments of ``allentune <command> <argv>``, parsed by the parser of the command, so
+    that tests get the same defaults as the command line.
+    """
+    module, class_name, _ = SUBCOMMANDS[command]
+    parser = argparse.ArgumentParser()
+    getattr(importlib.import_module(module), class_name)().add_subparser(command, parser.add_subparsers())
+    return parser.parse_args([command, *[str(arg) for arg in argv]])
+
+
+def _write_result_file(path, num_trials=20, datasets=None, seed=0):
+    """
+    result file with ``num_trials`` trials of a cnn and an lstm model, with uniformly
+    drawn accuracies and training durations, for every dataset in ``datasets`` if given.
+    """
+    rng = np.random.default_rng(seed)
+    rows = [dict({} if dataset is None else {"dataset": dataset},
+                 model=model,
+                 best_validation_accuracy=rng.uniform(0.5, 0.9),
+                 training_duration=rng.uniform(10, 100))
+            for dataset in (datasets or [None]) for model in ["cnn", "lstm"] for _ in range(num_trials)]
+    write_results(pd.DataFrame(rows), str(path))
+    return str(path)
+
+
+@pytest.fixture
+def command_args():
+    return _command_args
+
+
+@pytest.fixture
+def result_file():
+    return _write_result_file
+
+
+@pytest.fixture
+def search_args(tmp_path):
+    """
+    parse the arguments of ``allentune search`` for the fixture search space and base
+    config, with the experiment in ``tmp_path``. Later arguments override these.
+    """
+    def _search_args(*argv):
+        return _command_args("search", "--experiment-name", "experiment", "--log-dir", tmp_path,
+                             "--search-space", FIXTURES_ROOT / "search_space.json",
+                             "--base-config", FIXTURES_ROOT / "classifier.jsonnet", *argv)
+    return _search_args
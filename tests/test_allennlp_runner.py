@@ -0,0 +1,136 @@
+from allentune.modules import AllenNlpRunner
+from allentune.modules.allennlp_runner import RENDERED_CONFIG, ConfigRenderer
+import json
+import os
+import pathlib
+import pytest
+from types import SimpleNamespace
+
+FIXTURES_ROOT = pathlib.Path(__file__).parent / "fixtures"
+
+
+class TestAllenNlpRunner(object):
+
+    def test_config_renderer(self, monkeypatch):
+        import _jsonnet
+        renderer = ConfigRenderer('{"trainer": {"lr": std.parseJson(std.extVar("LR"))}}')
+        calls = []
+        evaluate_snippet = _jsonnet.evaluate_snippet
+
+        def counting_evaluate_snippet(*args, **kwargs):
+            calls.append(kwargs["ext_vars"])
+            return evaluate_snippet(*args, **kwargs)
+
+        monkeypatch.setattr(_jsonnet, "evaluate_snippet", counting_evaluate_snippet)
+        assert renderer.render({"LR": 0.1}) == {"trainer": {"lr": 0.1}}
+        config = renderer.render({"LR": "0.1"})
+        config["trainer"]["lr"] = 1.0
+        assert renderer.render({"LR": 0.1}) == {"trainer": {"lr": 0.1}}
+        assert len(calls) == 1
+
+    def test_render_design(self, search_args):
+        args = search_args()
+        with open(FIXTURES_ROOT / "search_space.json") as f:
+            search_config = json.load(f)
+        design_point = {key: val["choices"][0] if isinstance(val, dict) and "choices" in val
+                        else val["bounds"][0] if isinstance(val, dict) else val
+                        for key, val in search_config.items()}
+        rendered = AllenNlpRunner().render_design(args, [design_point])
+        assert rendered[0]["LEARNING_RATE"] == design_point["LEARNING_RATE"]
+        params = json.loads(rendered[0][RENDERED_CONFIG])
+        assert params["trainer"]["num_epochs"] == design_point["NUM_EPOCHS"]
+        del design_point["LEARNING_RATE"]
+        with pytest.raises(ValueError):
+            AllenNlpRunner().render_design(args, [design_point])
+
+    def test_recover_failed_trial(self, tmp_path, monkeypatch, search_args):
+        from allentune.modules import allennlp_runner
+        attempts = []
+
+        def train_model(params, serialization_dir, recover):
+            attempts.append(recover)
+            os.makedirs(serialization_dir, exist_ok=True)
+            with open(os.path.join(serialization_dir, "config.json"), "w") as config_file:
+                json.dump({"trainer": {}}, config_file)
+            if len(attempts) == 1:
+                raise RuntimeError("trial preempted")
+            with open(os.path.join(serialization_dir, "metrics.json"), "w") as metrics_file:
+                json.dump({"best_validation_accuracy": 0.5}, metrics_file)
+
+        monkeypatch.setattr(allennlp_runner, "train_model", train_model)
+        monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+        (tmp_path / "base.jsonnet").write_text('{"trainer": {"lr": std.extVar("LR")}}')
+        args = search_args("--base-config", tmp_path / "base.jsonnet", "--num-gpus", 0, "--gpus-per-trial", 0,
+                           "--cpus-per-trial", 0)
+        args.cwd = str(tmp_path)
+        train_func = AllenNlpRunner().get_run_func(args)
+        (tmp_path / "run_0").mkdir()
+        monkeypatch.chdir(tmp_path / "run_0")
+        results = []
+        with pytest.raises(RuntimeError):
+            train_func({"LR": 0.1}, lambda **result: results.append(result))
+        # the retry runs in the same directory and recovers from the earlier attempt
+        train_func({"LR": 0.1}, lambda **result: results.append(result))
+        assert attempts == [False, True]
+        assert results == [{"done": True, "best_validation_accuracy": 0.5}]
+
+    def test_tune_report_callback(self, tmp_path, monkeypatch, search_args):
+        from allentune.modules import allennlp_runner
+        trained = []
+
+        def train_model(params, serialization_dir, recover):
+            trained.append(params)
+            os.makedirs(serialization_dir, exist_ok=True)
+            with open(os.path.join(serialization_dir, "metrics.json"), "w") as metrics_file:
+                json.dump({"best_validation_accuracy": 0.5}, metrics_file)
+
+        monkeypatch.setattr(allennlp_runner, "train_model", train_model)
+        monkeypatch.setattr(allennlp_runner, "Params", lambda params_dict: SimpleNamespace(as_dict=lambda: params_dict))
+        monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+        (tmp_path / "base.jsonnet").write_text('{"trainer": {"lr": std.extVar("LR"), '
+                                               '"epoch_callbacks": [{"type": "log_metrics"}]}}')
+        args = search_args("--base-config", tmp_path / "base.jsonnet", "--num-gpus", 0, "--gpus-per-trial", 0,
+                           "--cpus-per-trial", 0)
+        args.cwd = str(tmp_path)
+        (tmp_path / "run_0").mkdir()
+        monkeypatch.chdir(tmp_path / "run_0")
+        AllenNlpRunner().get_run_func(args)({"LR": 0.1}, lambda **result: None)
+        # the callbacks of the base config are kept
+        assert trained[0].as_dict()["trainer"]["epoch_callbacks"] == [{"type": "log_metrics"}, {"type": "tune_report"}]
+
+    def test_reuse_then_report(self, tmp_path, monkeypatch, search_args, command_args):
+        from allentune.commands.report import generate_report
+        from allentune.modules import allennlp_runner
+        from allentune.util.config_index import CONFIG_INDEX_DIR, ConfigIndex, config_hash
+
+        def train_model(params, serialization_dir, recover):
+            raise AssertionError("reused configurations are not trained")
+
+        monkeypatch.setattr(allennlp_runner, "train_model", train_model)
+        monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+        (tmp_path / "base.jsonnet").write_text('{"trainer": {"lr": std.extVar("LR")}}')
+        experiment_dir = tmp_path / "experiment"
+        earlier_trial = experiment_dir / "run_0_2020-07-27_14-57-28" / "trial"
+        earlier_trial.mkdir(parents=True)
+        (earlier_trial / "config.json").write_text(json.dumps({"trainer": {"lr": "0.1"}}))
+        (earlier_trial / "metrics.json").write_text(json.dumps({"best_validation_accuracy": 0.5,
+                                                               "training_duration": "0:01:00"}))
+        (earlier_trial / "stdout.log").write_text("random_seed = 1\npytorch_seed = 2\nnumpy_seed = 3\n")
+        ConfigIndex(str(experiment_dir / CONFIG_INDEX_DIR)).claim(config_hash({"trainer": {"lr": "0.1"}}),
+                                                                  str(earlier_trial.parent))
+        args = search_args("--base-config", tmp_path / "base.jsonnet", "--num-gpus", 0, "--gpus-per-trial", 0,
+                           "--cpus-per-trial", 0, "--deduplicate", "reuse")
+        args.cwd = str(tmp_path)
+        (experiment_dir / "run_1_2020-07-27_14-57-29").mkdir()
+        monkeypatch.chdir(experiment_dir / "run_1_2020-07-27_14-57-29")
+        results = []
+        AllenNlpRunner().get_run_func(args)({"LR": 0.1}, lambda **result: results.append(result))
+        assert results[0]["best_validation_accuracy"] == 0.5
+
+        generate_report(command_args("report", "--log-dir", experiment_dir, "--model", "CNN",
+                                     "--performance-metric", "best_validation_accuracy"))
+        with open(experiment_dir / "results.jsonl") as f:
+            rows = [json.loads(line) for line in f]
+        assert len(rows) == 2
+        # the reused trial carries the log, and seeds, of the earlier one
+        assert [(row["random_seed"], row["numpy_seed"]) for row in rows] == [("1", "3"), ("1", "3")]
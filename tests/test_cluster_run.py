@@ -0,0 +1,37 @@
+from allentune.modules import AllenNlpRunner, RayExecutor
+import glob
+import json
+import os
+import pytest
+
+
+class MetricsRunner(AllenNlpRunner):
+    """
+    runner whose trials write metrics without training, to test scheduling on a cluster.
+    """
+
+    def get_run_func(self, args):
+        def train_func(config, reporter):
+            os.makedirs("trial", exist_ok=True)
+            with open(os.path.join("trial", "metrics.json"), "w") as metrics_file:
+                json.dump({"best_validation_accuracy": 0.5}, metrics_file)
+            reporter(done=True, best_validation_accuracy=0.5)
+        return train_func
+
+
+class TestClusterRun(object):
+
+    def test_run_on_cluster(self, tmp_path, search_args):
+        import ray
+        from ray.cluster_utils import Cluster
+        # a head node and a worker node, as separate raylets on this machine
+        cluster = Cluster(initialize_head=True, head_node_args={"num_cpus": 1})
+        cluster.add_node(num_cpus=1)
+        try:
+            args = search_args("--address", cluster.address, "--experiment-name", "test", "--num-cpus", 1,
+                               "--num-gpus", 0, "--cpus-per-trial", 1, "--gpus-per-trial", 0, "--num-samples", 4)
+            RayExecutor(MetricsRunner()).run(args)
+            assert len(glob.glob(str(tmp_path / "test" / "run_*" / "trial" / "metrics.json"))) == 4
+        finally:
+            ray.shutdown()
+            cluster.shutdown()
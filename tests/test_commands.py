@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = {"allennlp", "torch", "ray", "matplotlib", "seaborn", "scipy"}
+
+# Runs `allentune <argv>` and prints the top-level packages it imported, along with
+# the time it took to import allentune and parse the arguments.
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from allentune.commands import main
+try:
+    main(prog="allentune", argv=sys.argv[1:])
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+print(" ".join(sorted({name.split(".")[0] for name in sys.modules})), file=sys.stderr)
+print(elapsed, file=sys.stderr)
+"""
+
+
+def _startup(*argv):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+    process = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, *argv],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, check=True,
+                             universal_newlines=True)
+    modules, elapsed = process.stderr.strip().splitlines()[-2:]
+    return set(modules.split()), float(elapsed), process.stdout
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["search", "--help"], ["report", "--help"],
+                                  ["merge", "--help"], ["expected-max", "--help"]])
+def test_startup_does_not_import_heavy_modules(argv):
+    modules, _, output = _startup(*argv)
+    assert "usage" in output
+    assert not modules & HEAVY_MODULES
+
+
+def test_help_lists_every_command():
+    _, _, output = _startup("--help")
+    for command in ["search", "report", "merge", "plot", "expected-max"]:
+        assert command in output
+
+
+def test_startup_time():
+    # a loose bound, generous enough for slow CI machines, which still catches a
+    # command pulling torch or matplotlib back in at import time
+    start = time.perf_counter()
+    _startup("report", "--help")
+    assert time.perf_counter() - start < 5
+    _, elapsed, _ = _startup("--help")
+    assert elapsed < 1
@@ -0,0 +1,18 @@
+from allentune.util.config_index import ConfigIndex, config_hash
+
+
+class TestConfigIndex(object):
+
+    def test_config_hash(self):
+        assert config_hash({"a": 1, "b": {"c": [1, 2]}}) == config_hash({"b": {"c": [1, 2]}, "a": 1})
+        assert config_hash({"a": 1}) != config_hash({"a": 2})
+
+    def test_claim(self, tmp_path):
+        index = ConfigIndex(str(tmp_path / ".config_index"))
+        key = config_hash({"a": 1})
+        assert index.lookup(key) is None
+        assert index.claim(key, "run_1") is None
+        assert index.claim(key, "run_2") == "run_1"
+        # the index persists across instances
+        assert ConfigIndex(str(tmp_path / ".config_index")).claim(key, "run_3") == "run_1"
+        assert index.claim(config_hash({"a": 2}), "run_3") is None
@@ -0,0 +1,45 @@
+from allentune.util.dataset_cache import save_vocabulary, use_dataset_cache
+
+
+def _params():
+    return {"dataset_reader": {"type": "text_classification_json", "lazy": False},
+            "train_data_path": "train.jsonl",
+            "validation_data_path": "dev.jsonl",
+            "model": {"type": "basic_classifier"}}
+
+
+class TestDatasetCache(object):
+
+    def test_instance_cache(self, tmp_path):
+        params = _params()
+        use_dataset_cache(params, str(tmp_path))
+        cache_directory = params["dataset_reader"]["cache_directory"]
+        assert cache_directory.startswith(str(tmp_path / "instances"))
+        other = _params()
+        other["model"]["dropout"] = 0.5
+        use_dataset_cache(other, str(tmp_path))
+        assert other["dataset_reader"]["cache_directory"] == cache_directory
+        other = _params()
+        other["dataset_reader"]["max_tokens"] = 100
+        use_dataset_cache(other, str(tmp_path))
+        assert other["dataset_reader"]["cache_directory"] != cache_directory
+        lazy = _params()
+        lazy["dataset_reader"]["lazy"] = True
+        use_dataset_cache(lazy, str(tmp_path))
+        assert "cache_directory" not in lazy["dataset_reader"]
+
+    def test_vocabulary_cache(self, tmp_path):
+        params = _params()
+        vocabulary_dir = use_dataset_cache(params, str(tmp_path / "cache"))
+        assert vocabulary_dir is not None and "vocabulary" not in params
+        (tmp_path / "trial" / "vocabulary").mkdir(parents=True)
+        (tmp_path / "trial" / "vocabulary" / "tokens.txt").write_text("a\nb\n")
+        save_vocabulary(str(tmp_path / "trial"), vocabulary_dir)
+        # a second trial saving the vocabulary leaves the cached one in place
+        save_vocabulary(str(tmp_path / "trial"), vocabulary_dir)
+        params = _params()
+        params["model"]["dropout"] = 0.5
+        assert use_dataset_cache(params, str(tmp_path / "cache")) is None
+        assert params["vocabulary"] == {"type": "from_files", "directory": vocabulary_dir}
+        with open(f"{vocabulary_dir}/tokens.txt") as f:
+            assert f.read() == "a\nb\n"
@@ -0,0 +1,122 @@
+from allentune.util import expected_max
+from allentune.util.expected_max import bootstrap_samplemax, expected_max_budget, expected_max_curves, samplemax
+import pytest
+import numpy as np
+import scipy.special
+
+
+def _reference_samplemax(validation_performance, with_replacement=True):
+    # the original quadratic implementation from the plot command
+    validation_performance = sorted(validation_performance)
+    N = len(validation_performance)
+    pdfs = []
+    for n in range(1, N + 1):
+        cdfs = []
+        for i in range(1, N + 1):
+            if with_replacement:
+                cdfs.append((i / N) ** n)
+            else:
+                cdfs.append(scipy.special.comb(i, n) / scipy.special.comb(N, n))
+        pdfs.append(np.diff(cdfs, prepend=0))
+    means = [sum(x * p for x, p in zip(validation_performance, pdf)) for pdf in pdfs]
+    stds = [np.sqrt(sum((x - mean) ** 2 * p for x, p in zip(validation_performance, pdf)))
+            for mean, pdf in zip(means, pdfs)]
+    return {"mean": means, "var": stds, "max": np.max(validation_performance)}
+
+
+class TestSampleMax(object):
+
+    @pytest.mark.parametrize("with_replacement", [True, False])
+    def test_matches_reference(self, with_replacement):
+        performance = np.random.uniform(0.5, 0.9, size=150)
+        res = samplemax(performance, with_replacement=with_replacement)
+        expected = _reference_samplemax(performance, with_replacement=with_replacement)
+        assert np.allclose(res["mean"], expected["mean"], rtol=0, atol=1e-12)
+        assert np.allclose(res["var"], expected["var"], rtol=0, atol=1e-7)
+        assert res["max"] == expected["max"]
+
+    def test_large_sweep(self):
+        performance = np.random.uniform(0, 1, size=20000)
+        res = samplemax(performance)
+        assert len(res["mean"]) == 20000
+        assert np.all(np.diff(res["mean"]) >= -1e-12)
+        assert res["mean"][0] == pytest.approx(np.mean(performance))
+        assert res["mean"][-1] <= res["max"]
+
+    def test_large_sweep_without_replacement(self):
+        performance = np.random.uniform(0, 1, size=20000)
+        res = samplemax(performance, with_replacement=False)
+        assert np.all(np.isfinite(res["mean"])) and np.all(np.isfinite(res["var"]))
+        assert res["mean"][0] == pytest.approx(np.mean(performance))
+        assert res["mean"][-1] == pytest.approx(res["max"])
+        assert res["var"][-1] == pytest.approx(0, abs=1e-6)
+
+
+class TestBootstrapSampleMax(object):
+
+    def test_matches_replicate_loop(self):
+        performance = np.random.uniform(0.5, 0.9, size=40)
+        res = bootstrap_samplemax(performance, num_bootstrap=200, confidence=0.9, seed=3)
+        # the same replicates, one at a time
+        rng = np.random.default_rng(3)
+        replicates = performance[rng.integers(0, 40, (200, 40)).T]
+        curves = np.array([_reference_samplemax(replicates[:, b])["mean"] for b in range(200)])
+        assert np.allclose(res["lower"], np.quantile(curves, 0.05, axis=0), atol=1e-12)
+        assert np.allclose(res["upper"], np.quantile(curves, 0.95, axis=0), atol=1e-12)
+        assert np.allclose(res["mean"], samplemax(performance)["mean"])
+
+    def test_chunked(self, monkeypatch):
+        performance = np.random.uniform(0, 1, size=300)
+        res = bootstrap_samplemax(performance, num_bootstrap=100, seed=0)
+        monkeypatch.setattr(expected_max, "_MAX_BLOCK_ELEMENTS", 1000)
+        chunked = bootstrap_samplemax(performance, num_bootstrap=100, seed=0)
+        assert np.allclose(res["lower"], chunked["lower"]) and np.allclose(res["upper"], chunked["upper"])
+        assert np.all(np.array(res["lower"]) <= np.array(res["mean"]))
+        assert np.all(np.array(res["upper"]) <= res["max"])
+
+    def test_bounded_memory(self, monkeypatch):
+        import tracemalloc
+        monkeypatch.setattr(expected_max, "_MAX_BLOCK_ELEMENTS", 2 ** 14)
+        performance = np.random.uniform(0, 1, size=1000)
+        tracemalloc.start()
+        try:
+            res = bootstrap_samplemax(performance, num_bootstrap=500, seed=0)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # all curves would take 1000 * 500 * 8 bytes = 4MB
+        assert peak < 2 ** 20
+        assert len(res["lower"]) == 1000
+
+    def test_expected_max_curves(self):
+        performance = {"cnn": np.random.uniform(0, 1, size=50).tolist(),
+                       "lstm": np.random.uniform(0, 1, size=30).tolist()}
+        curves = expected_max_curves(performance, num_bootstrap=50, seed=0, workers=2)
+        assert set(curves) == {"cnn", "lstm"}
+        assert curves == expected_max_curves(performance, num_bootstrap=50, seed=0)
+        assert expected_max_curves(performance)["lstm"] == samplemax(performance["lstm"])
+
+
+class TestExpectedMaxBudget(object):
+
+    def test_constant_durations(self):
+        performance = np.random.uniform(0, 1, size=50)
+        # with equal durations, each of 3 workers completes k trials in k durations
+        res = expected_max_budget(performance, np.full(50, 10.0), num_workers=3,
+                                  budgets=[10, 20, 50], num_simulations=20000, seed=0)
+        expected = samplemax(performance)["mean"]
+        assert np.allclose(res["mean"], [expected[2], expected[5], expected[14]], atol=0.01)
+
+    def test_no_completed_trials(self):
+        res = expected_max_budget([0.5, 0.7, 0.6], [60, 600, 120], num_workers=2,
+                                  budgets=[30, 60, 600], seed=0)
+        assert np.isnan(res["mean"][0])
+        assert res["mean"][1] == pytest.approx(0.5)
+        assert 0.6 < res["mean"][2] < 0.7
+
+    def test_large_sweep(self):
+        performance = np.random.uniform(0, 1, size=20000)
+        res = expected_max_budget(performance, np.random.exponential(100, size=20000), num_workers=8, seed=0)
+        assert len(res["budget"]) == 100
+        assert np.all(np.diff(res["mean"]) >= -1e-3)
+        assert res["mean"][-1] <= res["max"]
@@ -0,0 +1,71 @@
+from allentune.commands.expected_max import expected_max_table
+from allentune.util import expected_max_cache
+from allentune.util.expected_max import samplemax
+from allentune.util.expected_max_cache import compute_expected_max, curves_table
+import pytest
+import json
+import numpy as np
+import pandas as pd
+
+
+class TestExpectedMaxCache(object):
+
+    def test_compute_expected_max(self, tmp_path, result_file):
+        result_file = result_file(tmp_path / "results.jsonl")
+        curves = compute_expected_max(result_file, cache_dir=None)
+        performance = pd.read_json(result_file, lines=True, precise_float=True)
+        expected = samplemax(performance[performance.model == "cnn"].best_validation_accuracy)
+        assert set(curves) == {"cnn", "lstm"}
+        assert np.allclose(curves["cnn"]["mean"], expected["mean"])
+        budget_curves = compute_expected_max(result_file, x_axis_time=True, parallel_workers=2, cache_dir=None)
+        assert len(budget_curves["lstm"]["budget"]) == 100
+
+    def test_cache(self, tmp_path, result_file, monkeypatch):
+        write_result_file, result_file = result_file, result_file(tmp_path / "results.jsonl")
+        cache_dir = str(tmp_path / "cache")
+        curves = compute_expected_max(result_file, num_bootstrap=50, cache_dir=cache_dir)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("curves were recomputed")
+
+        monkeypatch.setattr(expected_max_cache, "expected_max_curves", fail)
+        assert compute_expected_max(result_file, num_bootstrap=50, cache_dir=cache_dir) == curves
+        # other settings, or another result file content, are computed again
+        with pytest.raises(AssertionError):
+            compute_expected_max(result_file, num_bootstrap=100, cache_dir=cache_dir)
+        write_result_file(tmp_path / "results.jsonl", seed=1)
+        with pytest.raises(AssertionError):
+            compute_expected_max(result_file, num_bootstrap=50, cache_dir=cache_dir)
+
+    def test_curves_table(self, tmp_path, result_file):
+        curves = compute_expected_max(result_file(tmp_path / "results.jsonl", num_trials=5), cache_dir=None)
+        table = curves_table(curves)
+        assert list(table.columns) == ["model", "n", "mean", "var", "max"]
+        assert len(table) == 10 and table.n.max() == 5
+
+    @pytest.mark.parametrize("output_file", ["curves.json", "curves.csv"])
+    def test_expected_max_table(self, tmp_path, result_file, command_args, output_file):
+        args = command_args("expected-max", "--result-file", result_file(tmp_path / "results.jsonl"),
+                            "--output-file", tmp_path / output_file, "--cache-dir", tmp_path / "cache")
+        expected_max_table(args)
+        if output_file.endswith(".csv"):
+            assert len(pd.read_csv(tmp_path / output_file)) == 40
+        else:
+            with open(tmp_path / output_file) as f:
+                assert len(json.load(f)["cnn"]["mean"]) == 20
+
+    def test_expected_max_table_budget_json(self, tmp_path, result_file, command_args):
+        args = command_args("expected-max", "--result-file", result_file(tmp_path / "results.jsonl"),
+                            "--output-file", tmp_path / "curves.json", "--x-axis-time", "--parallel-workers", 4,
+                            "--no-cache")
+        expected_max_table(args)
+
+        def reject(constant):
+            raise ValueError(f"invalid JSON constant {constant}")
+
+        with open(tmp_path / "curves.json") as f:
+            curves = json.loads(f.read(), parse_constant=reject)
+        # the shortest budget, a hundredth of the 40 trials' total duration over 4 workers,
+        # is shorter than any trial, which take 10 to 100 seconds
+        assert curves["cnn"]["mean"][0] is None
+        assert curves["cnn"]["mean"][-1] is not None
@@ -0,0 +1,58 @@
+from allentune.commands.merge import merge_reports
+from allentune.util.result_files import read_results, write_results
+import pytest
+import pandas as pd
+
+
+class TestMerge(object):
+
+    def _inputs(self, tmp_path, extension=".jsonl"):
+        first = tmp_path / ("first" + extension)
+        second = tmp_path / ("second" + extension)
+        write_results(pd.DataFrame({"directory": ["a", "b", "c"],
+                                    "best_validation_accuracy": [0.5, 0.6, 0.7],
+                                    "model": ["CNN"] * 3}), str(first))
+        write_results(pd.DataFrame({"directory": ["c", "d"],
+                                    "best_validation_accuracy": [0.7, 0.8],
+                                    "trainer.optimizer.lr": [0.1, 0.01]}), str(second))
+        return [first, second]
+
+    @pytest.mark.parametrize("output", ["merged.jsonl", "out/merged.parquet", "merged.arrow"])
+    def test_merge(self, tmp_path, command_args, output):
+        if not output.endswith(".jsonl"):
+            pytest.importorskip("pyarrow")
+        merge_reports(command_args("merge", "--input-files", *self._inputs(tmp_path),
+                                   "--output-file", tmp_path / output, "--chunksize", 2))
+        merged = read_results(str(tmp_path / output))
+        assert merged.columns.tolist() == ["directory", "best_validation_accuracy", "model", "trainer.optimizer.lr"]
+        assert merged["directory"].tolist() == ["a", "b", "c", "c", "d"]
+        assert merged["model"].isna().tolist() == [False] * 3 + [True] * 2
+        assert merged["trainer.optimizer.lr"].isna().tolist() == [True] * 3 + [False] * 2
+
+    def test_merge_dedupe(self, tmp_path, command_args):
+        pytest.importorskip("pyarrow")
+        merge_reports(command_args("merge", "--input-files", *self._inputs(tmp_path, ".parquet"),
+                                   "--output-file", tmp_path / "merged.jsonl", "--chunksize", 2, "--dedupe"))
+        merged = read_results(str(tmp_path / "merged.jsonl"))
+        assert merged["directory"].tolist() == ["a", "b", "c", "d"]
+
+    def test_merge_incompatible_types(self, tmp_path, command_args):
+        pytest.importorskip("pyarrow")
+        write_results(pd.DataFrame({"directory": ["a"], "seed": [1]}), str(tmp_path / "first.jsonl"))
+        write_results(pd.DataFrame({"directory": ["b"], "seed": ["x"]}), str(tmp_path / "second.jsonl"))
+        args = command_args("merge", "--input-files", tmp_path / "first.jsonl", tmp_path / "second.jsonl",
+                            "--output-file", tmp_path / "merged.parquet")
+        with pytest.raises(ValueError, match="Column seed"):
+            merge_reports(args)
+        # JSON lines output has no column types to reconcile
+        args.output_file = str(tmp_path / "merged.jsonl")
+        merge_reports(args)
+        assert read_results(str(tmp_path / "merged.jsonl"))["seed"].tolist() == [1, "x"]
+
+    def test_merge_without_pyarrow(self, tmp_path, command_args, monkeypatch):
+        from allentune.util import result_files
+        monkeypatch.setattr(result_files, "columnar_formats_available", lambda: False)
+        args = command_args("merge", "--input-files", *self._inputs(tmp_path),
+                            "--output-file", tmp_path / "merged.parquet")
+        with pytest.raises(ImportError, match="pip install pyarrow"):
+            merge_reports(args)
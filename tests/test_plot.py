@@ -0,0 +1,40 @@
+import matplotlib
+matplotlib.use("Agg")
+
+from allentune.commands.plot import _panels
+import pytest
+
+
+class TestPlot(object):
+
+    def test_panels(self, tmp_path, result_file):
+        first = result_file(tmp_path / "first.jsonl", 10, ["sst", "imdb"])
+        second = result_file(tmp_path / "second.jsonl", 10, ["ag"])
+        assert [name for name, _, _ in _panels([first, second], None, None)] == ["first", "second"]
+        assert _panels([first, second], None, "dataset") == [("sst", first, "sst"), ("imdb", first, "imdb"),
+                                                             ("ag", second, "ag")]
+        assert [name for name, _, _ in _panels([first], ["SST", "IMDB"], "dataset")] == ["SST", "IMDB"]
+        with pytest.raises(ValueError):
+            _panels([first], ["SST"], "dataset")
+
+    def test_plot(self, tmp_path, command_args, result_file):
+        args = command_args("plot", "--result-file", result_file(tmp_path / "results.jsonl", 10, ["sst", "imdb"]),
+                            "--dataset-field", "dataset", "--subplots", 2, 2, "--figsize", 8, 8,
+                            "--output-file", tmp_path / "plot.png", "--plot-errorbar", "--workers", 2,
+                            "--cache-dir", tmp_path / "cache")
+        args.func(args)
+        assert (tmp_path / "plot.png").exists()
+
+    def test_samplemax_reexport(self):
+        # samplemax moved to allentune.util.expected_max, and is still importable from here
+        from allentune.commands.plot import samplemax
+        from allentune.util import expected_max
+        assert samplemax is expected_max.samplemax
+
+    def test_errorbar_with_x_axis_time(self, tmp_path, command_args, result_file, caplog):
+        args = command_args("plot", "--result-file", result_file(tmp_path / "results.jsonl", 10),
+                            "--subplots", 1, 1, "--figsize", 4, 4, "--output-file", tmp_path / "plot.png", "--x-axis-time",
+                            "--plot-errorbar", "--no-cache")
+        args.func(args)
+        assert (tmp_path / "plot.png").exists()
+        assert "ignored with --x-axis-time" in caplog.text
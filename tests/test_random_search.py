@@ -1,4 +1,4 @@
-from allentune.util.random_search import RandomSearch
+from allentune.util.random_search import HyperparameterSearch, RandomSearch
 import pytest
 import numpy as np
 import string
@@ -35,4 +35,81 @@ class TestRandomSearch(object):
         sampler = random_search.random_uniform(0, 1)
         for _ in range(3):
             res = sampler()
-            assert res >= 0 and res <= 1
\ No newline at end of file
+            assert res >= 0 and res <= 1
+
+    def _search_config(self):
+        return {"CONSTANT": 7,
+                "LR": {"sampling strategy": "loguniform", "bounds": [1e-5, 1e-1]},
+                "DROPOUT": {"sampling strategy": "uniform", "bounds": [0, 0.5]},
+                "LAYERS": {"sampling strategy": "integer", "bounds": [1, 5]},
+                "ENCODER": {"sampling strategy": "choice", "choices": ["cnn", "lstm"]}}
+
+    def test_latin_hypercube_design(self):
+        configs = RandomSearch.latin_hypercube_design(self._search_config(), 8, seed=0)
+        assert len(configs) == 8
+        assert all(config["CONSTANT"] == 7 for config in configs)
+        # every stratum of each hyperparameter is sampled exactly once
+        dropout_strata = sorted(int(config["DROPOUT"] / 0.5 * 8) for config in configs)
+        assert dropout_strata == list(range(8))
+        assert sorted(config["LAYERS"] for config in configs) == [1, 1, 2, 2, 3, 3, 4, 4]
+        assert sorted(config["ENCODER"] for config in configs) == ["cnn"] * 4 + ["lstm"] * 4
+        assert configs == RandomSearch.latin_hypercube_design(self._search_config(), 8, seed=0)
+
+    def test_sobol_design(self):
+        configs = RandomSearch.sobol_design(self._search_config(), 16, seed=0)
+        assert len(configs) == 16
+        for config in configs:
+            assert 1e-5 <= config["LR"] <= 1e-1
+            assert isinstance(config["LAYERS"], int) and 1 <= config["LAYERS"] < 5
+            assert config["ENCODER"] in ["cnn", "lstm"]
+        assert sorted(config["LAYERS"] for config in configs) == [1] * 4 + [2] * 4 + [3] * 4 + [4] * 4
+
+    def test_sample_batch(self):
+        search = HyperparameterSearch(LR=RandomSearch.random_loguniform(1e-5, 1e-1),
+                                      LAYERS=RandomSearch.random_integer(1, 5),
+                                      ENCODER=RandomSearch.random_choice(["cnn", "lstm"]),
+                                      FEATURES=RandomSearch.random_choice(["a", "b", "c"], n=2),
+                                      EPOCHS=10,
+                                      NAME="imdb")
+        batch = search.sample_batch(1000)
+        assert all(len(column) == 1000 for column in batch.values())
+        assert np.all((batch["LR"] >= 1e-5) & (batch["LR"] <= 1e-1))
+        assert set(batch["LAYERS"]) == {1, 2, 3, 4}
+        assert set(batch["ENCODER"]) == {"cnn", "lstm"}
+        assert all(len(set(features.split())) == 2 for features in batch["FEATURES"])
+        assert set(batch["EPOCHS"]) == {10} and set(batch["NAME"]) == {"imdb"}
+
+    def test_sample(self):
+        search = HyperparameterSearch(LR=RandomSearch.random_loguniform(1e-5, 1e-1),
+                                      LAYERS=RandomSearch.random_integer(1, 5),
+                                      ENCODER=RandomSearch.random_choice(["cnn", "lstm"]),
+                                      EPOCHS=10)
+        sample = search.sample()
+        assert isinstance(sample["LR"], float)
+        assert isinstance(sample["LAYERS"], int)
+        assert sample["ENCODER"] in ["cnn", "lstm"] and isinstance(sample["ENCODER"], str)
+        assert sample["EPOCHS"] == 10
+
+    def test_constant_bool(self):
+        # constant booleans are passed to the config as 1 or 0, for std.parseInt(std.extVar(...))
+        search = HyperparameterSearch(USE_CHAR=True, LOWERCASE=False)
+        sample = search.sample()
+        assert sample == {"USE_CHAR": 1, "LOWERCASE": 0}
+        assert all(type(value) is int for value in sample.values())
+        batch = search.sample_batch(3)
+        assert batch["USE_CHAR"].tolist() == [1, 1, 1] and batch["LOWERCASE"].tolist() == [0, 0, 0]
+
+    def test_seeded_sample(self):
+        search = HyperparameterSearch(LR=RandomSearch.random_loguniform(1e-5, 1e-1),
+                                      LAYERS=RandomSearch.random_integer(1, 5),
+                                      FEATURES=RandomSearch.random_choice(["a", "b", "c"], n=2),
+                                      EPOCHS=10)
+        first = [search.sample(rng) for rng in RandomSearch.trial_generators(42, 8)]
+        # draws from the global state in between do not change the seeded samples
+        np.random.random(100)
+        second = [search.sample(rng) for rng in RandomSearch.trial_generators(42, 8)]
+        assert first == second
+        assert len({sample["LR"] for sample in first}) == 8
+        # each trial's stream only depends on the seed and its index
+        assert search.sample(RandomSearch.trial_generators(42, 3)[2]) == first[2]
+        assert [search.sample(rng) for rng in RandomSearch.trial_generators(43, 8)] != first
@@ -0,0 +1,146 @@
+from allentune.modules import AllenNlpRunner, RayExecutor
+import pytest
+import json
+import pathlib
+import numpy as np
+
+FIXTURES_ROOT = pathlib.Path(__file__).parent / "fixtures"
+
+
+def _search_config():
+    with open(FIXTURES_ROOT / "search_space.json") as f:
+        return json.load(f)
+
+
+class TestRayExecutor(object):
+
+    def test_hyperopt_search_space(self):
+        hyperopt = pytest.importorskip("hyperopt")
+        space = RayExecutor(AllenNlpRunner()).hyperopt_search_space(_search_config())
+        assert set(space) == {"SEED", "DROPOUT", "LEARNING_RATE", "MAX_FILTER_SIZE",
+                              "HIDDEN_SIZE", "NUM_FILTERS", "NUM_OUTPUT_LAYERS"}
+        for _ in range(20):
+            sample = hyperopt.pyll.stochastic.sample(space)
+            assert isinstance(sample["MAX_FILTER_SIZE"], int) and 3 <= sample["MAX_FILTER_SIZE"] < 6
+            assert 1e-4 <= sample["LEARNING_RATE"] <= 1e-1
+            assert sample["NUM_OUTPUT_LAYERS"] in [1, 2, 3]
+
+    def test_skopt_search_space(self):
+        pytest.importorskip("skopt")
+        space = RayExecutor(AllenNlpRunner()).skopt_search_space(_search_config())
+        assert space["MAX_FILTER_SIZE"].bounds == (3, 5)
+        assert space["LEARNING_RATE"].prior == "log-uniform"
+        assert list(space["NUM_OUTPUT_LAYERS"].categories) == [1, 2, 3]
+
+    def test_seeded_design(self):
+        executor = RayExecutor(AllenNlpRunner())
+        design = executor.seeded_design(_search_config(), 5, seed=7)
+        assert design == executor.seeded_design(_search_config(), 5, seed=7)
+        assert len({config["LEARNING_RATE"] for config in design}) == 5
+        assert all(3 <= config["MAX_FILTER_SIZE"] < 6 for config in design)
+
+    def test_remove_completed(self, tmp_path, search_args):
+        executor = RayExecutor(AllenNlpRunner())
+        design = executor.seeded_design(_search_config(), 4, seed=7)
+        args = search_args()
+        for index, design_point in enumerate(design[:3]):
+            trial_dir = tmp_path / "experiment" / f"run_{index}_design_point={index}" / "trial"
+            trial_dir.mkdir(parents=True)
+            with open(trial_dir.parent / "params.json", "w") as f:
+                json.dump({"design_point": design_point}, f)
+            # the third trial did not finish training
+            if index < 2:
+                (trial_dir / "metrics.json").write_text("{}")
+        assert executor.remove_completed(args, design) == design[2:]
+
+    def test_seeded_design_distinct(self):
+        executor = RayExecutor(AllenNlpRunner())
+        search_config = {"LAYERS": {"sampling strategy": "integer", "bounds": [1, 4]}}
+        design = executor.seeded_design(search_config, 3, seed=7, distinct=True)
+        assert sorted(config["LAYERS"] for config in design) == [1, 2, 3]
+        design = executor.seeded_design(dict(search_config), 30, seed=7)
+        assert len(design) == 30 and {config["LAYERS"] for config in design} == {1, 2, 3}
+
+    def test_completed_trials(self, tmp_path, search_args):
+        executor = RayExecutor(AllenNlpRunner())
+        args = search_args()
+        for index in range(3):
+            trial_dir = tmp_path / "experiment" / f"run_{index}" / "trial"
+            trial_dir.mkdir(parents=True)
+            if index != 1:
+                (trial_dir / "metrics.json").write_text("{}")
+        (tmp_path / "experiment" / ".config_index").mkdir()
+        assert executor.completed_trials(args) == [str(tmp_path / "experiment" / "run_0"),
+                                                   str(tmp_path / "experiment" / "run_2")]
+
+    def test_resume(self, tmp_path, monkeypatch, search_args):
+        from allentune.modules import ray_executor
+        runs = []
+        monkeypatch.setattr(ray_executor.ray, "init", lambda **kwargs: None)
+        monkeypatch.setattr(ray_executor, "register_trainable", lambda name, func: None)
+        monkeypatch.setattr(ray_executor, "run_experiments", lambda experiments, **kwargs: runs.append(experiments))
+        for index in range(3):
+            trial_dir = tmp_path / "experiment" / f"run_{index}" / "trial"
+            trial_dir.mkdir(parents=True)
+            (trial_dir / "metrics.json").write_text("{}")
+        args = search_args("--num-samples", 5, "--num-gpus", 0, "--gpus-per-trial", 0, "--resume")
+        executor = RayExecutor(AllenNlpRunner())
+        executor.run(args)
+        assert runs[-1]["experiment"]["num_samples"] == 2
+        args.num_samples = 3
+        executor.run(args)
+        assert len(runs) == 1
+
+    def test_gpus_per_trial(self, search_args):
+        executor = RayExecutor(AllenNlpRunner())
+        assert executor.gpus_per_trial(search_args("--num-gpus", 2, "--gpus-per-trial", 0.5)) == 0.5
+        assert executor.gpus_per_trial(search_args("--num-gpus", 2, "--trials-per-gpu", 4)) == 0.25
+        # without GPUs, trials run on the CPU
+        assert executor.gpus_per_trial(search_args("--num-gpus", 0, "--trials-per-gpu", 4)) == 0
+        with pytest.raises(ValueError):
+            executor.gpus_per_trial(search_args("--num-gpus", 2, "--gpus-per-trial", 1.5))
+        # a number of trials per GPU and a number of GPUs per trial contradict each other
+        with pytest.raises(SystemExit):
+            search_args("--trials-per-gpu", 4, "--gpus-per-trial", 0.5)
+
+    @pytest.mark.parametrize("scheduler", ["fifo", "asha", "hyperband", "median"])
+    def test_get_scheduler(self, monkeypatch, search_args, scheduler):
+        from allentune.modules import ray_executor
+        monkeypatch.setattr(ray_executor, "AsyncHyperBandScheduler", lambda **kwargs: ("async_hyperband", kwargs))
+        monkeypatch.setattr(ray_executor, "MedianStoppingRule", lambda **kwargs: ("median", kwargs))
+        args = search_args("--scheduler", scheduler, "--metric", "validation_accuracy", "--mode", "max",
+                           "--max-t", 20, "--grace-period", 2, "--reduction-factor", 3, "--brackets", 4)
+        result = RayExecutor(AllenNlpRunner()).get_scheduler(args)
+        if scheduler == "fifo":
+            assert result is None
+            return
+        name, kwargs = result
+        assert kwargs["time_attr"] == "training_iteration"
+        assert kwargs["metric"] == "validation_accuracy" and kwargs["mode"] == "max"
+        assert kwargs["grace_period"] == 2
+        if scheduler == "median":
+            assert name == "median" and kwargs["hard_stop"]
+        else:
+            assert name == "async_hyperband"
+            assert kwargs["max_t"] == 20 and kwargs["reduction_factor"] == 3
+            assert kwargs["brackets"] == (1 if scheduler == "asha" else 4)
+
+    def test_get_unknown_scheduler(self, search_args):
+        args = search_args()
+        # the parser only accepts known schedulers
+        args.scheduler = "pbt"
+        with pytest.raises(KeyError):
+            RayExecutor(AllenNlpRunner()).get_scheduler(args)
+
+    def test_design_not_logged_at_info(self, tmp_path, monkeypatch, search_args, caplog):
+        import logging
+        from allentune.modules import ray_executor
+        monkeypatch.setattr(ray_executor.ray, "init", lambda **kwargs: None)
+        monkeypatch.setattr(ray_executor, "register_trainable", lambda name, func: None)
+        monkeypatch.setattr(ray_executor, "run_experiments", lambda experiments, **kwargs: None)
+        with caplog.at_level(logging.INFO, logger=ray_executor.__name__):
+            RayExecutor(AllenNlpRunner()).run(search_args("--num-samples", 3, "--random-seed", 0,
+                                                          "--num-gpus", 0, "--gpus-per-trial", 0))
+        messages = [record.getMessage() for record in caplog.records if record.levelno >= logging.INFO]
+        assert any("with 3 design points" in message for message in messages)
+        assert not any("rendered_config" in message for message in messages)
@@ -0,0 +1,107 @@
+from allentune.commands.report import generate_report, MANIFEST_FILE
+import pytest
+import json
+import os
+import pandas as pd
+
+
+def _make_trial(log_dir, index, accuracy, seed=None):
+    trial_dir = log_dir / f"run_{index}_2020-07-27_14-57-28" / "trial"
+    trial_dir.mkdir(parents=True)
+    metrics = {"best_validation_accuracy": accuracy, "training_duration": "0:01:00.5"}
+    config = {"trainer": {"num_epochs": 10, "optimizer": {"lr": 0.001 * (index + 1)}}}
+    if seed is not None:
+        config.update({"random_seed": seed, "numpy_seed": seed, "pytorch_seed": seed})
+    (trial_dir / "metrics.json").write_text(json.dumps(metrics))
+    (trial_dir / "config.json").write_text(json.dumps(config))
+    (trial_dir / "stdout.log").write_text("random_seed = 1\npytorch_seed = 2\nnumpy_seed = 3\n")
+    return trial_dir
+
+
+REPORT_ARGS = ["--performance-metric", "best_validation_accuracy", "--model", "CNN"]
+
+
+class TestReport(object):
+
+    def test_report(self, tmp_path, command_args):
+        for index, accuracy in enumerate([0.5, 0.6, 0.7]):
+            _make_trial(tmp_path, index, accuracy)
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True, precise_float=True)
+        assert len(df) == 3
+        assert set(df["model"]) == {"CNN"}
+        assert df["training_duration"].tolist() == [60.5] * 3
+        assert df["random_seed"].tolist() == [1] * 3
+
+    def test_report_is_incremental(self, tmp_path, command_args):
+        for index, accuracy in enumerate([0.5, 0.6, 0.7]):
+            _make_trial(tmp_path, index, accuracy)
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        with open(tmp_path / MANIFEST_FILE) as f:
+            assert len(json.load(f)["trials"]) == 3
+
+        # new trials are appended, unchanged ones are left alone
+        (tmp_path / "results.jsonl").write_text(
+            (tmp_path / "results.jsonl").read_text().replace(":0.5,", ":0.25,"))
+        _make_trial(tmp_path, 3, 0.9)
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True, precise_float=True)
+        assert sorted(df["best_validation_accuracy"]) == [0.25, 0.6, 0.7, 0.9]
+
+        # modified trials are re-read, and --rebuild re-reads everything
+        modified = tmp_path / "run_1_2020-07-27_14-57-28" / "trial" / "metrics.json"
+        modified.write_text(json.dumps({"best_validation_accuracy": 0.65, "training_duration": "0:01:00"}))
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True, precise_float=True)
+        assert sorted(df["best_validation_accuracy"]) == [0.25, 0.65, 0.7, 0.9]
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS, "--rebuild"))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True, precise_float=True)
+        assert sorted(df["best_validation_accuracy"]) == [0.5, 0.65, 0.7, 0.9]
+
+    @pytest.mark.parametrize("use_processes", [False, True])
+    def test_report_with_workers(self, tmp_path, command_args, use_processes):
+        for index in range(20):
+            _make_trial(tmp_path, index, index / 20)
+        workers = ["--workers", 4] + (["--use-processes"] if use_processes else [])
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS, *workers))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True, precise_float=True)
+        assert df["best_validation_accuracy"].tolist() == [index / 20 for index in sorted(range(20), key=lambda index: f"run_{index}_")]
+
+    def test_seeds_from_config_skip_log(self, tmp_path, command_args):
+        trial_dir = _make_trial(tmp_path, 0, 0.5, seed=42)
+        os.remove(trial_dir / "stdout.log")
+        trial_dir = _make_trial(tmp_path, 1, 0.6)
+        with open(trial_dir / "stdout.log", "w") as f:
+            f.write("random_seed = 7\npytorch_seed = 8\nnumpy_seed = 9\n" + "training line\n" * 1000)
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True)
+        assert df["random_seed"].tolist() == [42, 7]
+        assert df["numpy_seed"].tolist() == [42, 9]
+
+    def test_seeds_partly_from_config(self, tmp_path, command_args):
+        trial_dir = _make_trial(tmp_path, 0, 0.5)
+        with open(trial_dir / "config.json") as f:
+            config = json.load(f)
+        config["random_seed"] = 42
+        (trial_dir / "config.json").write_text(json.dumps(config))
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True)
+        # the config's seed wins, the others come from the log
+        assert df[["random_seed", "pytorch_seed", "numpy_seed"]].values.tolist() == [[42, 2, 3]]
+
+    def test_seeds_without_log(self, tmp_path, command_args):
+        trial_dir = _make_trial(tmp_path, 0, 0.5)
+        os.remove(trial_dir / "stdout.log")
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS))
+        df = pd.read_json(tmp_path / "results.jsonl", lines=True)
+        assert len(df) == 1 and df["random_seed"].isna().all()
+
+    def test_columnar_report(self, tmp_path, command_args):
+        pytest.importorskip("pyarrow")
+        for index, accuracy in enumerate([0.5, 0.6]):
+            _make_trial(tmp_path, index, accuracy)
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS, "--output-format", "parquet"))
+        _make_trial(tmp_path, 2, 0.7)
+        generate_report(command_args("report", "--log-dir", tmp_path, *REPORT_ARGS, "--output-format", "parquet"))
+        df = pd.read_parquet(tmp_path / "results.parquet")
+        assert df["best_validation_accuracy"].tolist() == [0.5, 0.6, 0.7]
@@ -0,0 +1,36 @@
+from allentune.util.result_files import read_results, write_results, append_results
+import pytest
+import pandas as pd
+
+
+def _results():
+    return pd.DataFrame({"model": ["CNN", "CNN", "LSTM"],
+                         "training_duration": [60.5, 30.0, 90.25],
+                         "best_validation_accuracy": [0.5, 0.6, 0.7],
+                         "trainer.optimizer.lr": [0.1, 0.01, 0.001]})
+
+
+class TestResultFiles(object):
+
+    @pytest.mark.parametrize("extension", [".jsonl", ".parquet", ".arrow"])
+    def test_round_trip(self, tmp_path, extension):
+        if extension != ".jsonl":
+            pytest.importorskip("pyarrow")
+        path = str(tmp_path / ("results" + extension))
+        write_results(_results(), path)
+        pd.testing.assert_frame_equal(read_results(path), _results())
+        projected = read_results(path, columns=["model", "best_validation_accuracy"])
+        pd.testing.assert_frame_equal(projected, _results()[["model", "best_validation_accuracy"]])
+
+    @pytest.mark.parametrize("extension", [".jsonl", ".parquet"])
+    def test_append(self, tmp_path, extension):
+        if extension != ".jsonl":
+            pytest.importorskip("pyarrow")
+        path = str(tmp_path / ("results" + extension))
+        write_results(_results().iloc[:2], path)
+        append_results(_results().iloc[2:], path)
+        pd.testing.assert_frame_equal(read_results(path), _results())
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            read_results(str(tmp_path / "results.csv"))
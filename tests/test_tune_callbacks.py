@@ -0,0 +1,49 @@
+from allentune.modules import tune_callbacks
+from allentune.modules.tune_callbacks import TuneReportCallback
+from types import SimpleNamespace
+import pytest
+
+
+class LazyDataset(object):
+
+    def __iter__(self):
+        return iter([])
+
+
+class TestTuneReportCallback(object):
+
+    def _run_epochs(self, monkeypatch, trainer, times):
+        reports = []
+        clock = iter(times)
+        monkeypatch.setattr(tune_callbacks.tune, "report", lambda **result: reports.append(result))
+        monkeypatch.setattr(tune_callbacks.time, "time", lambda: next(clock))
+        callback = TuneReportCallback()
+        metrics = {"training_loss": 0.5, "validation_accuracy": 0.8, "best_epoch": 0, "epoch": "ignored"}
+        # the trainer calls epoch callbacks once before training, with epoch -1
+        for epoch in range(-1, len(times) - 1):
+            callback(trainer, metrics, epoch, is_master=True)
+        return reports
+
+    def test_reports_every_epoch(self, monkeypatch):
+        trainer = SimpleNamespace(data_loader=SimpleNamespace(dataset=list(range(100))))
+        reports = self._run_epochs(monkeypatch, trainer, [0.0, 10.0, 30.0])
+        assert len(reports) == 2
+        assert reports[0] == {"training_loss": 0.5, "validation_accuracy": 0.8, "best_epoch": 0,
+                              "epoch_duration": 10.0, "instances_per_second": 10.0}
+        assert reports[1]["epoch_duration"] == pytest.approx(20.0)
+        assert reports[1]["instances_per_second"] == pytest.approx(5.0)
+
+    def test_lazy_dataset(self, monkeypatch):
+        trainer = SimpleNamespace(data_loader=SimpleNamespace(dataset=LazyDataset()))
+        reports = self._run_epochs(monkeypatch, trainer, [0.0, 10.0])
+        assert reports == [{"training_loss": 0.5, "validation_accuracy": 0.8, "best_epoch": 0,
+                            "epoch_duration": 10.0}]
+
+    def test_only_master_reports(self, monkeypatch):
+        reports = []
+        monkeypatch.setattr(tune_callbacks.tune, "report", lambda **result: reports.append(result))
+        callback = TuneReportCallback()
+        trainer = SimpleNamespace(data_loader=SimpleNamespace(dataset=[]))
+        callback(trainer, {"training_loss": 0.5}, -1, is_master=False)
+        callback(trainer, {"training_loss": 0.5}, 0, is_master=False)
+        assert reports == []